@@ -0,0 +1,148 @@
+"""
+Bulk verification benchmark
+
+Seeds a scratch SQLite database with images, starts the API (uvicorn)
+against it and times POST /api/verify/bulk: time to the first NDJSON line
+and to the whole response. A share of the requested serials is unknown so
+the negative path is exercised too. Run from the backend directory:
+
+    python benchmarks/bulk_verify.py --images 50000 --serials 10000
+
+Exits non-zero if the median full response takes longer than --max-seconds
+or any result is wrong.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import statistics
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+from load_test import wait_for
+
+def make_serial(issued_at: datetime) -> str:
+    return f"RICH-{issued_at.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8].upper()}"
+
+async def seed(db_path: str, images: int, users: int) -> list:
+    """Create the schema and bulk insert users and images; returns the image serials."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    from sqlalchemy import insert
+    from database import AsyncSessionLocal, init_db, close_db
+    from models import Image, User
+
+    await init_db()
+    # Old enough that the API's verification filter covers them
+    issued = datetime.utcnow() - timedelta(days=1)
+    serials = [make_serial(issued - timedelta(seconds=i)) for i in range(images)]
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(User), [
+            {"email": f"bulk{i}@example.com", "password_hash": "x"} for i in range(users)
+        ])
+        await db.execute(insert(Image), [
+            {
+                "user_id": i % users + 1,
+                "serial": serial,
+                "image_path_verified": f"{serial}_verified.jpg",
+                "image_path_wallpaper": f"{serial}_wallpaper.jpg",
+                "prompt": "bulk verification benchmark",
+                "created_at": issued - timedelta(seconds=i),
+            }
+            for i, serial in enumerate(serials)
+        ])
+        await db.commit()
+    await close_db()
+    return serials
+
+def request_once(base_url: str, serials: list, expected_valid: set) -> dict:
+    started = time.perf_counter()
+    first_line = None
+    results = []
+    with httpx.stream("POST", f"{base_url}/api/verify/bulk", json={"serials": serials}, timeout=60) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            if first_line is None:
+                first_line = time.perf_counter() - started
+            results.append(json.loads(line))
+    total = time.perf_counter() - started
+
+    wrong = sum(
+        1 for serial, result in zip(serials, results)
+        if result["serial"] != serial or result["valid"] != (serial in expected_valid)
+    ) + abs(len(results) - len(serials))
+    return {"first_line_ms": round(first_line * 1000, 2), "total_ms": round(total * 1000, 2), "wrong": wrong}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=50000, help="images seeded into the scratch database")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--serials", type=int, default=10000, help="serials per bulk request")
+    parser.add_argument("--unknown-fraction", type=float, default=0.1, help="share of serials that don't exist")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8102)
+    parser.add_argument("--max-seconds", type=float, default=1.0, help="fail if the median response is slower")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "bulk.db")
+        known = asyncio.run(seed(db_path, args.images, args.users))
+
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{db_path}",
+            "STORAGE_LOCAL_ROOT": os.path.join(workdir, "generated"),
+            "DERIVATIVE_CACHE_DIR": os.path.join(workdir, "derivatives"),
+            "VERIFY_BULK_MAX_SERIALS": str(args.serials),
+        }
+        api = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "server:app", "--port", str(args.port), "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+            env=env
+        )
+        base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            wait_for(f"{base_url}/api/health")
+            rounds = []
+            for _ in range(args.rounds):
+                unknown = int(args.serials * args.unknown_fraction)
+                issued = datetime.utcnow() - timedelta(days=1)
+                serials = random.sample(known, min(args.serials - unknown, len(known)))
+                serials += [make_serial(issued - timedelta(seconds=i)) for i in range(unknown)]
+                random.shuffle(serials)
+                rounds.append(request_once(base_url, serials, set(known)))
+        finally:
+            api.terminate()
+            api.wait(timeout=10)
+
+    median_total = statistics.median(r["total_ms"] for r in rounds)
+    print(json.dumps({
+        "serials_per_request": args.serials,
+        "rounds": rounds,
+        "median_first_line_ms": statistics.median(r["first_line_ms"] for r in rounds),
+        "median_total_ms": median_total,
+    }, indent=2))
+
+    if any(r["wrong"] for r in rounds):
+        print("FAIL: wrong verification results")
+        sys.exit(1)
+    if median_total > args.max_seconds * 1000:
+        print(f"FAIL: median response {median_total} ms exceeds {args.max_seconds * 1000:.0f} ms")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
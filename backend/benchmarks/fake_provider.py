@@ -0,0 +1,125 @@
+"""
+Fake image provider
+
+A local stand-in for the OpenAI images API with configurable latency,
+tail latency, error rate and payload size, per model. Point the backend at it with
+OPENAI_BASE_URL and any OPENAI_API_KEY:
+
+    python benchmarks/fake_provider.py --port 8999 --latency 0.5 \\
+        --model dall-e-3:error_rate=1 --model dall-e-2:latency=0.2
+
+    OPENAI_BASE_URL=http://127.0.0.1:8999/v1 OPENAI_API_KEY=fake uvicorn server:app
+"""
+import io
+import os
+import base64
+import random
+import asyncio
+import argparse
+from functools import lru_cache
+from typing import Dict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from PIL import Image
+
+DEFAULTS = {"latency": 0.5, "jitter": 0.1, "tail_rate": 0.0, "tail_latency": 5.0, "error_rate": 0.0}
+
+def parse_model_override(value: str) -> Dict[str, Dict[str, float]]:
+    """Parse "dall-e-3:latency=2,error_rate=0.5"."""
+    model, _, options = value.partition(":")
+    settings = {}
+    for option in options.split(","):
+        if option:
+            name, _, number = option.partition("=")
+            if name not in DEFAULTS:
+                raise argparse.ArgumentTypeError(f"Unknown option {name}; expected one of {list(DEFAULTS)}")
+            settings[name] = float(number)
+    return {model: settings}
+
+@lru_cache(maxsize=8)
+def render_image(size: str, payload: str = "flat") -> bytes:
+    """A PNG of the requested size: "flat" is a few KB, "noise" is incompressible (several MB)."""
+    width, height = (int(part) for part in size.split("x"))
+    if payload == "noise":
+        image = Image.frombytes("RGB", (width, height), os.urandom(width * height * 3))
+    else:
+        image = Image.new("RGB", (width, height), (180, 140, 40))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG", compress_level=1)
+    return buffer.getvalue()
+
+@lru_cache(maxsize=8)
+def encoded_image(size: str, payload: str = "flat") -> str:
+    return base64.b64encode(render_image(size, payload)).decode()
+
+def create_app(defaults: Dict[str, float], overrides: Dict[str, Dict[str, float]], payload: str = "flat") -> FastAPI:
+    app = FastAPI(title="Fake image provider")
+    counters = {"requests": 0, "errors": 0}
+
+    @app.post("/v1/images/generations")
+    async def generate(request: Request):
+        body = await request.json()
+        settings = {**defaults, **overrides.get(body.get("model"), {})}
+        counters["requests"] += 1
+
+        delay = settings["latency"] + random.uniform(-settings["jitter"], settings["jitter"])
+        if random.random() < settings["tail_rate"]:
+            delay = settings["tail_latency"]
+        await asyncio.sleep(max(delay, 0))
+
+        if random.random() < settings["error_rate"]:
+            counters["errors"] += 1
+            return JSONResponse(
+                status_code=500,
+                content={"error": {"message": "Injected failure", "type": "server_error"}}
+            )
+
+        size = body.get("size") or "1024x1024"
+        if body.get("response_format") == "url":
+            url = str(request.base_url) + f"images/{size}.png"
+            data = [{"url": url} for _ in range(body.get("n", 1))]
+        else:
+            encoded = encoded_image(size, payload)
+            data = [{"b64_json": encoded} for _ in range(body.get("n", 1))]
+        return {"created": 0, "data": data}
+
+    @app.get("/images/{size}.png")
+    async def download(size: str):
+        return Response(render_image(size, payload), media_type="image/png")
+
+    @app.get("/stats")
+    async def stats():
+        return counters
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8999)
+    parser.add_argument("--latency", type=float, default=DEFAULTS["latency"], help="mean response time in seconds")
+    parser.add_argument("--jitter", type=float, default=DEFAULTS["jitter"], help="uniform +/- jitter in seconds")
+    parser.add_argument("--tail-rate", type=float, default=DEFAULTS["tail_rate"], help="fraction of slow responses")
+    parser.add_argument("--tail-latency", type=float, default=DEFAULTS["tail_latency"], help="latency of slow responses")
+    parser.add_argument("--error-rate", type=float, default=DEFAULTS["error_rate"], help="fraction of 500 responses")
+    parser.add_argument("--payload", choices=("flat", "noise"), default="flat", help="image payload style")
+    parser.add_argument("--model", type=parse_model_override, action="append", default=[],
+                        help="per-model override, e.g. dall-e-3:latency=2,error_rate=0.5")
+    args = parser.parse_args()
+
+    defaults = {
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "tail_rate": args.tail_rate,
+        "tail_latency": args.tail_latency,
+        "error_rate": args.error_rate,
+    }
+    overrides = {}
+    for override in args.model:
+        overrides.update(override)
+    uvicorn.run(create_app(defaults, overrides, args.payload), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
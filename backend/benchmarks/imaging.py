@@ -0,0 +1,271 @@
+"""
+Imaging micro-benchmarks
+
+Times the per-request CPU work of the imaging services: composition of
+both variants at every size listed in AI_MODELS, JPEG encoding at the
+configured quality, QR generation, serial text rendering, the full QR +
+caption overlay (with the pre-vectorization path kept as overlay_legacy
+for comparison) and serial generation. Each benchmark runs in a fresh
+process and reports median wall time, median CPU time and peak RSS growth.
+
+Results are compared against stored baselines (benchmarks/baselines/
+imaging.json); the run fails if any metric regresses beyond its
+threshold. Baselines are machine specific, so record them on the machine
+that runs the check. Run from the backend directory:
+
+    python benchmarks/imaging.py                   # compare with baselines
+    python benchmarks/imaging.py --filter compose  # subset
+    python benchmarks/imaging.py --update-baseline # record new baselines
+"""
+import os
+import sys
+import json
+import math
+import time
+import platform
+import argparse
+import resource
+import statistics
+import multiprocessing
+from io import BytesIO
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "imaging.json")
+SERIAL = "RICH-20250101120000-AB12CD34"
+VERIFY_URL = f"http://localhost:3000/verify/{SERIAL}"
+MIN_SAMPLE_SECONDS = 0.1
+
+def supported_sizes() -> List[Tuple[int, int]]:
+    from services.ai_models_config import AI_MODELS
+    sizes = set()
+    for config in AI_MODELS.values():
+        for size in config.get("supported_sizes", []):
+            width, height = size.split("x")
+            sizes.add((int(width), int(height)))
+    return sorted(sizes)
+
+def synthetic_photo(width: int, height: int):
+    """A deterministic image with photo-like detail (fractal + gradients)."""
+    from PIL import Image
+    red = Image.effect_mandelbrot((width, height), (-2.0, -1.25, 0.75, 1.25), 100)
+    green = Image.linear_gradient("L").resize((width, height))
+    blue = Image.radial_gradient("L").resize((width, height))
+    return Image.merge("RGB", (red, green, blue))
+
+def provider_png(width: int, height: int) -> bytes:
+    buffer = BytesIO()
+    synthetic_photo(width, height).save(buffer, "PNG")
+    return buffer.getvalue()
+
+# Each factory prepares inputs outside the timed region and returns the
+# callable to time.
+
+def bench_compose(width: int, height: int) -> Callable[[], object]:
+    from services.image_composer import ImageComposer
+    from services.qr_generator import QRGenerator, QR_OVERLAY_SIZE
+    base = provider_png(width, height)
+    qr_image = QRGenerator.generate(VERIFY_URL, QR_OVERLAY_SIZE)
+    return lambda: ImageComposer.compose_variants(base, ("verified", "wallpaper"), qr_image=qr_image, serial=SERIAL)
+
+def bench_jpeg_encode(width: int, height: int) -> Callable[[], object]:
+    from services.image_composer import ImageComposer
+    image = synthetic_photo(width, height)
+    return lambda: ImageComposer._encode_jpeg(image)
+
+def bench_qr_generate() -> Callable[[], object]:
+    from services.qr_generator import QRGenerator, QR_OVERLAY_SIZE
+    return lambda: QRGenerator.generate(VERIFY_URL, QR_OVERLAY_SIZE)
+
+def bench_text_render() -> Callable[[], object]:
+    from PIL import Image
+    from services.image_composer import text_mask
+
+    canvas = Image.new("RGB", (1024, 80), (40, 40, 40))
+
+    def render():
+        # Same steps as the serial caption in ImageComposer._render_verified
+        mask = text_mask(f"Serial: {SERIAL}")
+        for color, (x, y) in (((0, 0, 0), (22, 42)), ((255, 255, 255), (20, 40))):
+            canvas.paste(color, (x, y, x + mask.width, y + mask.height), mask)
+
+    return render
+
+def bench_overlay() -> Callable[[], object]:
+    """Per-image QR + caption overlay cost as composed today."""
+    from services.image_composer import text_mask
+    from services.qr_generator import QRGenerator, QR_OVERLAY_SIZE
+
+    canvas = synthetic_photo(1024, 1024)
+
+    def overlay():
+        qr_image = QRGenerator.generate(VERIFY_URL, QR_OVERLAY_SIZE)
+        canvas.paste(qr_image, (20, 1024 - 170))
+        mask = text_mask(f"Serial: {SERIAL}")
+        for color, (x, y) in (((0, 0, 0), (22, 1011)), ((255, 255, 255), (20, 1009))):
+            canvas.paste(color, (x, y, x + mask.width, y + mask.height), mask)
+
+    return overlay
+
+def bench_overlay_legacy() -> Callable[[], object]:
+    """The overlay before direct-to-size QR rasterization and glyph caching, for comparison."""
+    import qrcode
+    from PIL import ImageDraw, ImageFont
+
+    canvas = synthetic_photo(1024, 1024)
+
+    def overlay():
+        qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=2)
+        qr.add_data(VERIFY_URL)
+        qr.make(fit=True)
+        qr_image = qr.make_image(fill_color="white", back_color="black")
+        canvas.paste(qr_image.resize((150, 150)).convert("RGB"), (20, 1024 - 170))
+        font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 16)
+        draw = ImageDraw.Draw(canvas)
+        draw.text((22, 1011), f"Serial: {SERIAL}", font=font, fill="black")
+        draw.text((20, 1009), f"Serial: {SERIAL}", font=font, fill="white")
+
+    return overlay
+
+def bench_serial_generate() -> Callable[[], object]:
+    from services.serial_generator import SerialGenerator
+    # Too fast to time singly; one iteration is a batch of 1000
+    return lambda: [SerialGenerator.generate() for _ in range(1000)]
+
+def benchmarks() -> Dict[str, Tuple[Callable[..., Callable[[], object]], tuple]]:
+    suite = {}
+    for width, height in supported_sizes():
+        suite[f"compose_{width}x{height}"] = (bench_compose, (width, height))
+        suite[f"jpeg_encode_{width}x{height}"] = (bench_jpeg_encode, (width, height))
+    suite["qr_generate"] = (bench_qr_generate, ())
+    suite["text_render"] = (bench_text_render, ())
+    suite["overlay"] = (bench_overlay, ())
+    suite["overlay_legacy"] = (bench_overlay_legacy, ())
+    suite["serial_generate_x1000"] = (bench_serial_generate, ())
+    return suite
+
+def _max_rss_kb() -> int:
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return usage // 1024 if sys.platform == "darwin" else usage
+
+def _run_in_child(name: str, repeat: int, results):
+    factory, args = benchmarks()[name]
+    fn = factory(*args)
+    rss_before = _max_rss_kb()
+    warmup = time.perf_counter()
+    fn()  # warm-up; also the peak-memory sample
+    warmup = time.perf_counter() - warmup
+    peak_rss_kb = _max_rss_kb() - rss_before
+
+    # Loop fast benchmarks so each sample spans at least MIN_SAMPLE_SECONDS
+    loops = max(1, math.ceil(MIN_SAMPLE_SECONDS / max(warmup, 1e-6)))
+    walls, cpus = [], []
+    for _ in range(repeat):
+        wall, cpu = time.perf_counter(), time.process_time()
+        for _ in range(loops):
+            fn()
+        walls.append((time.perf_counter() - wall) / loops)
+        cpus.append((time.process_time() - cpu) / loops)
+    results.put({
+        "wall_ms": round(statistics.median(walls) * 1000, 3),
+        "cpu_ms": round(statistics.median(cpus) * 1000, 3),
+        "peak_rss_kb": peak_rss_kb,
+    })
+
+def run_benchmark(name: str, repeat: int) -> Dict[str, float]:
+    """Run one benchmark in a fresh process so memory peaks don't bleed across."""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_run_in_child, args=(name, repeat, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+def check(results: Dict[str, Dict[str, float]], baseline: dict, thresholds: Dict[str, float]) -> List[str]:
+    problems = []
+    for name, metrics in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            continue
+        for metric, threshold in thresholds.items():
+            before, after = previous.get(metric), metrics.get(metric)
+            if before is None or after is None:
+                continue
+            # Absolute floor so tiny numbers don't flap
+            floor = 1.0 if metric.endswith("_ms") else 1024
+            if after > max(before * (1 + threshold), before + floor):
+                problems.append(f"{name} {metric}: {before} -> {after} (+{(after / before - 1) * 100 if before else 0:.0f}%)")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=7, help="timed iterations per benchmark")
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--time-threshold", type=float, default=0.25, help="allowed relative wall/CPU regression")
+    parser.add_argument("--memory-threshold", type=float, default=0.25, help="allowed relative peak RSS regression")
+    parser.add_argument("--output", help="also write this run's results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'benchmark':<26}{'wall ms':>10}{'cpu ms':>10}{'peak rss KiB':>14}")
+    for name in benchmarks():
+        if args.filter not in name:
+            continue
+        results[name] = run_benchmark(name, args.repeat)
+        metrics = results[name]
+        print(f"{name:<26}{metrics['wall_ms']:>10}{metrics['cpu_ms']:>10}{metrics['peak_rss_kb']:>14}")
+
+    run = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "pillow": __import__("PIL").__version__,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(run, f, indent=2)
+
+    if args.update_baseline:
+        baseline = {"results": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        # Filtered runs only replace the benchmarks they ran
+        baseline["environment"] = run["environment"]
+        baseline.setdefault("results", {}).update(results)
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; run with --update-baseline first")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("environment", {}).get("platform") != run["environment"]["platform"]:
+        print("warning: baseline was recorded on a different platform")
+    problems = check(results, baseline, {
+        "wall_ms": args.time_threshold,
+        "cpu_ms": args.time_threshold,
+        "peak_rss_kb": args.memory_threshold,
+    })
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    if problems:
+        sys.exit(1)
+    print("no regressions against baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+End-to-end load test
+
+Starts the fake image provider and the API (uvicorn) against a scratch
+database and storage directory, then drives a weighted mix of realistic
+user flows for a fixed duration:
+
+    register/login -> generate -> verify bursts, gallery pagination,
+    full-size and derivative image downloads
+
+and reports throughput and p50/p95/p99 latency per endpoint. Results are
+written as JSON; pass --compare with an earlier result to fail on
+regressions. Run from the backend directory:
+
+    python benchmarks/load_test.py --users 20 --duration 60 \\
+        --mix generate=1,verify=4,gallery=3,download=4 --provider-latency 1.0
+
+    python benchmarks/load_test.py --compare benchmarks/results/load-baseline.json
+
+Use --url to target an already running deployment instead (the fake
+provider is then not started and must be configured there).
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+CUSTOMIZATION = {
+    "style": ["minimalist", "maximalist", "elegant", "modern", "classic"],
+    "color_scheme": ["gold", "silver", "black_gold", "rose_gold", "platinum"],
+    "elements": ["cars", "watches", "jewelry", "yachts", "mansions"],
+    "mood": ["luxurious", "extravagant", "sophisticated", "bold", "subtle"],
+}
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in ("generate", "verify", "gallery", "download"):
+            raise argparse.ArgumentTypeError(f"Unknown flow: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    async def request(self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            self.statuses[name][0] += 1
+            return None
+        self.latencies[name].append(time.perf_counter() - started)
+        self.statuses[name][response.status_code] += 1
+        if response.status_code >= 500:
+            self.errors[name] += 1
+        return response
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, mix: Dict[str, float], shared_serials: List[str]):
+        self.client = client
+        self.recorder = recorder
+        self.mix = mix
+        self.shared_serials = shared_serials
+        self.headers: Dict[str, str] = {}
+        self.images: List[dict] = []
+
+    async def sign_in(self):
+        email = f"load-{uuid.uuid4().hex[:12]}@example.com"
+        credentials = {"email": email, "password": "load-test-password"}
+        response = await self.recorder.request(self.client, "register", "POST", "/api/auth/register", json=credentials)
+        if response is None or response.status_code != 200:
+            raise RuntimeError(f"registration failed: {response.status_code if response else 'no response'}")
+        response = await self.recorder.request(self.client, "login", "POST", "/api/auth/login", json=credentials)
+        if response is None or response.status_code != 200:
+            raise RuntimeError("login failed")
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def run(self, stop_at: float):
+        await self.sign_in()
+        await self.generate()
+        flows = list(self.mix)
+        weights = [self.mix[flow] for flow in flows]
+        while time.monotonic() < stop_at:
+            flow = random.choices(flows, weights)[0]
+            await getattr(self, flow)()
+
+    async def generate(self):
+        body = {
+            "customization": {key: random.choice(values) for key, values in CUSTOMIZATION.items()},
+            "ai_model": "dalle",
+        }
+        response = await self.recorder.request(
+            self.client, "generate", "POST", "/api/generate-image", json=body, headers=self.headers
+        )
+        if response is not None and response.status_code == 200:
+            image = response.json()
+            self.images.append(image)
+            self.shared_serials.append(image["serial"])
+
+    async def verify(self):
+        # Bursts mix known serials with never-issued ones
+        for _ in range(5):
+            if self.shared_serials and random.random() < 0.7:
+                serial = random.choice(self.shared_serials)
+            else:
+                serial = f"RICH-20200101000000-{uuid.uuid4().hex[:8].upper()}"
+            await self.recorder.request(self.client, "verify", "GET", f"/api/verify/{serial}")
+
+    async def gallery(self):
+        cursor = None
+        for _ in range(3):
+            params = {"limit": 12}
+            if cursor:
+                params["cursor"] = cursor
+            response = await self.recorder.request(
+                self.client, "my_images", "GET", "/api/my-images", params=params, headers=self.headers
+            )
+            if response is None or response.status_code != 200:
+                return
+            cursor = response.json().get("next_cursor")
+            if not cursor:
+                return
+
+    async def download(self):
+        if not self.images:
+            return
+        image = random.choice(self.images)
+        await self.recorder.request(self.client, "image_full", "GET", image["image_url_wallpaper"])
+        await self.recorder.request(
+            self.client, "image_derivative", "GET",
+            f"/api/images/{image['serial']}/wallpaper", params={"w": 512, "fmt": "webp"}
+        )
+
+def wait_for(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+def start_stack(args, workdir: str) -> List[subprocess.Popen]:
+    provider = subprocess.Popen(
+        [
+            sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "fake_provider.py"),
+            "--port", str(args.provider_port),
+            "--latency", str(args.provider_latency),
+            "--jitter", str(args.provider_jitter),
+            "--error-rate", str(args.provider_error_rate),
+            "--payload", args.provider_payload,
+        ],
+        cwd=BACKEND_DIR
+    )
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'load.db')}",
+        "STORAGE_BACKEND": "local",
+        "STORAGE_LOCAL_ROOT": os.path.join(workdir, "generated"),
+        "DERIVATIVE_CACHE_DIR": os.path.join(workdir, "derivatives"),
+        "GENERATION_CACHE_ENABLED": "false",
+        "OPENAI_API_KEY": "load-test",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.provider_port}/v1",
+        # The load generator plays many users from one address
+        "GENERATION_RATE_PER_MINUTE": "0",
+        "BCRYPT_ROUNDS": str(args.bcrypt_rounds),
+    }
+    api = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "server:app",
+            "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning",
+        ],
+        cwd=BACKEND_DIR,
+        env=env
+    )
+    processes = [provider, api]
+    try:
+        wait_for(f"http://127.0.0.1:{args.provider_port}/stats")
+        wait_for(f"http://127.0.0.1:{args.port}/api/health")
+    except Exception:
+        stop_stack(processes)
+        raise
+    return processes
+
+def stop_stack(processes: List[subprocess.Popen]):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+async def drive(base_url: str, args) -> dict:
+    recorder = Recorder()
+    shared_serials: List[str] = []
+    limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        started = time.monotonic()
+        stop_at = started + args.duration
+        users = [VirtualUser(client, recorder, args.mix, shared_serials) for _ in range(args.users)]
+        outcomes = await asyncio.gather(*(user.run(stop_at) for user in users), return_exceptions=True)
+        elapsed = time.monotonic() - started
+
+    endpoints = {}
+    for name in sorted(set(recorder.latencies) | set(recorder.errors)):
+        latencies = recorder.latencies[name]
+        endpoints[name] = {
+            "requests": len(latencies) + recorder.statuses[name].get(0, 0),
+            "errors": recorder.errors[name],
+            "throughput_rps": round(len(latencies) / elapsed, 3),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+            "statuses": {str(code): count for code, count in sorted(recorder.statuses[name].items())},
+        }
+    return {
+        "elapsed_seconds": round(elapsed, 2),
+        "total_requests": sum(endpoint["requests"] for endpoint in endpoints.values()),
+        "total_throughput_rps": round(sum(len(v) for v in recorder.latencies.values()) / elapsed, 3),
+        "failed_users": sum(1 for outcome in outcomes if isinstance(outcome, Exception)),
+        "user_errors": sorted({str(outcome) for outcome in outcomes if isinstance(outcome, Exception)}),
+        "endpoints": endpoints,
+    }
+
+def compare(result: dict, baseline: dict, max_regression: float) -> List[str]:
+    """Endpoints whose p95 or throughput regressed by more than max_regression."""
+    problems = []
+    for name, current in result["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if not previous or not previous.get("p95_ms") or not current.get("p95_ms"):
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + max_regression):
+            problems.append(f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if previous["throughput_rps"] and current["throughput_rps"] < previous["throughput_rps"] * (1 - max_regression):
+            problems.append(f"{name}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} req/s")
+        if current["errors"] > previous["errors"]:
+            problems.append(f"{name}: errors {previous['errors']} -> {current['errors']}")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load after sign-in")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("generate=1,verify=4,gallery=3,download=4"))
+    parser.add_argument("--timeout", type=float, default=120, help="per-request client timeout")
+    parser.add_argument("--url", help="target an already running API instead of starting one")
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--bcrypt-rounds", type=int, default=10)
+    parser.add_argument("--provider-port", type=int, default=8999)
+    parser.add_argument("--provider-latency", type=float, default=1.0)
+    parser.add_argument("--provider-jitter", type=float, default=0.2)
+    parser.add_argument("--provider-error-rate", type=float, default=0.0)
+    parser.add_argument("--provider-payload", choices=("flat", "noise"), default="noise")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="result file (default: benchmarks/results/load-<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier result file to check for regressions")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed relative p95/throughput regression")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    processes: List[subprocess.Popen] = []
+    with tempfile.TemporaryDirectory() as workdir:
+        base_url = args.url
+        if base_url is None:
+            processes = start_stack(args, workdir)
+            base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            result = asyncio.run(drive(base_url, args))
+        finally:
+            stop_stack(processes)
+
+    result["config"] = {
+        key: value for key, value in vars(args).items()
+        if key not in ("output", "compare")
+    }
+    result["environment"] = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+    print(f"{'endpoint':<18}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, endpoint in result["endpoints"].items():
+        print(
+            f"{name:<18}{endpoint['requests']:>10}{endpoint['errors']:>8}{endpoint['throughput_rps']:>10}"
+            f"{str(endpoint['p50_ms']):>10}{str(endpoint['p95_ms']):>10}{str(endpoint['p99_ms']):>10}"
+        )
+    print(f"total: {result['total_requests']} requests, {result['total_throughput_rps']} req/s, "
+          f"{result['failed_users']} failed users")
+    for error in result["user_errors"]:
+        print(f"  user failed: {error}")
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("load-%Y%m%d-%H%M%S.json"))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            problems = compare(result, json.load(f), args.max_regression)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        sys.exit(1 if problems else 0)
+
+if __name__ == "__main__":
+    main()
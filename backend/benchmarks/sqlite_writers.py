@@ -0,0 +1,102 @@
+"""
+SQLite concurrency check
+
+Hammers a scratch SQLite database with N concurrent writers (and readers)
+through the application's engines and reports any "database is locked"
+errors. Run from the backend directory:
+
+    python benchmarks/sqlite_writers.py --writers 50 --inserts 20 --processes 4
+
+Exits non-zero if any write failed.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def run_worker(db_path: str, worker: int, writers: int, inserts: int, readers: int, results):
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    from sqlalchemy import select, func
+    from database import AsyncSessionLocal, ReadSessionLocal, close_db
+    from models import User
+
+    errors = []
+
+    async def writer(index: int):
+        for n in range(inserts):
+            try:
+                async with AsyncSessionLocal() as db:
+                    db.add(User(email=f"w{worker}-{index}-{n}@example.com", password_hash="x"))
+                    await db.commit()
+            except Exception as e:
+                errors.append(str(e))
+
+    async def reader():
+        for _ in range(inserts):
+            try:
+                async with ReadSessionLocal() as db:
+                    await db.scalar(select(func.count(User.id)))
+            except Exception as e:
+                errors.append(str(e))
+
+    async def main():
+        await asyncio.gather(
+            *[writer(i) for i in range(writers)],
+            *[reader() for _ in range(readers)]
+        )
+        await close_db()
+
+    asyncio.run(main())
+    results.put(errors)
+
+async def prepare(db_path: str):
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    from database import init_db, close_db
+    await init_db()
+    await close_db()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=50, help="concurrent writer tasks per process")
+    parser.add_argument("--inserts", type=int, default=20, help="inserts per writer task")
+    parser.add_argument("--readers", type=int, default=10, help="concurrent reader tasks per process")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes sharing the database")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "bench.db")
+        asyncio.run(prepare(db_path))
+
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        started = time.perf_counter()
+        processes = [
+            context.Process(
+                target=run_worker,
+                args=(db_path, i, args.writers, args.inserts, args.readers, results)
+            )
+            for i in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        errors = []
+        for _ in processes:
+            errors.extend(results.get())
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+    total = args.processes * args.writers * args.inserts
+    print(f"{total} inserts from {args.processes * args.writers} writers in {elapsed:.2f}s "
+          f"({total / elapsed:.0f} inserts/s), {len(errors)} errors")
+    for error in errors[:5]:
+        print(f"  {error}")
+    sys.exit(1 if errors else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -8,22 +9,156 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./imrich.db")
 
+def to_async_url(url: str) -> str:
+    """Map a plain database URL onto its asyncio driver."""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if url.startswith("postgres://"):
+        return "postgresql+asyncpg://" + url[len("postgres://"):]
+    if url.startswith("postgresql://"):
+        return "postgresql+asyncpg://" + url[len("postgresql://"):]
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+# Connection pool tuning (ignored by SQLite's in-memory pools)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+
+# SQLite production profile: WAL, relaxed fsync, one serialized writer
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "production")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "8"))
+SQLITE_WRITE_TIMEOUT = float(os.getenv("SQLITE_WRITE_TIMEOUT", "30"))
+
+def _is_memory_sqlite(url: str) -> bool:
+    return ":memory:" in url or url.rstrip("/").endswith("sqlite+aiosqlite:")
+
+USE_SQLITE_PROFILE = (
+    ASYNC_DATABASE_URL.startswith("sqlite")
+    and SQLITE_PROFILE == "production"
+    and not _is_memory_sqlite(ASYNC_DATABASE_URL)
+)
+
+def _pool_options(url: str) -> dict:
+    if _is_memory_sqlite(url):
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+def _sqlite_pragmas(read_only: bool = False):
+    """Build a connect listener that applies the SQLite production pragmas."""
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+    return set_pragmas
+
+if USE_SQLITE_PROFILE:
+    # A single pooled connection serializes every INSERT/UPDATE in this process
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        echo=DB_ECHO,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=SQLITE_WRITE_TIMEOUT,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    event.listen(async_engine.sync_engine, "connect", _sqlite_pragmas())
+
+    # Reads go through their own pool of read-only connections
+    read_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        echo=DB_ECHO,
+        pool_size=SQLITE_READ_POOL_SIZE,
+        max_overflow=0,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    event.listen(read_engine.sync_engine, "connect", _sqlite_pragmas(read_only=True))
+else:
+    # Async engine used by the API
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        echo=DB_ECHO,
+        **_pool_options(ASYNC_DATABASE_URL)
+    )
+    read_engine = async_engine
+
+# Sessions that write; commit promptly so the writer connection is released
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+# Read-only sessions
+ReadSessionLocal = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+# Synchronous engine for scripts and one-off maintenance tasks
 engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
 )
+if USE_SQLITE_PROFILE:
+    event.listen(engine, "connect", _sqlite_pragmas())
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
-def init_db():
-    from models import User, Image, Payment
-    Base.metadata.create_all(bind=engine)
+async def get_read_db():
+    async with ReadSessionLocal() as db:
+        yield db
+
+def _create_schema(connection):
+    Base.metadata.create_all(bind=connection)
+    # create_all skips columns and indexes on tables that already exist; add
+    # new nullable columns so older databases keep working
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                column_type = column.type.compile(dialect=connection.dialect)
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=connection, checkfirst=True)
+
+async def init_db():
+    from models import User, Image, Payment, GenerationJob
+    async with async_engine.begin() as connection:
+        await connection.run_sync(_create_schema)
+
+async def close_db():
+    await async_engine.dispose()
+    if read_engine is not async_engine:
+        await read_engine.dispose()
@@ -0,0 +1,180 @@
+import os
+import mimetypes
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Tuple
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+
+from services.storage import StorageBackend, StoredObject
+
+# Generated images never change once written
+IMAGE_CACHE_CONTROL = os.getenv("IMAGE_CACHE_CONTROL", "public, max-age=31536000, immutable")
+IMAGE_MEMORY_CACHE_MB = int(os.getenv("IMAGE_MEMORY_CACHE_MB", "64"))
+IMAGE_MEMORY_CACHE_MAX_ITEM_KB = int(os.getenv("IMAGE_MEMORY_CACHE_MAX_ITEM_KB", "4096"))
+
+class HotImageCache:
+    """Bounded in-memory LRU of the most requested images (bytes + metadata)."""
+
+    def __init__(self, max_bytes: int, max_item_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[bytes, StoredObject]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, StoredObject]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, data: bytes, stored: StoredObject):
+        if len(data) > self.max_item_bytes or len(data) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= len(previous[0])
+            self._entries[key] = (data, stored)
+            self.total_bytes += len(data)
+            while self.total_bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+hot_image_cache = HotImageCache(
+    IMAGE_MEMORY_CACHE_MB * 1024 * 1024,
+    IMAGE_MEMORY_CACHE_MAX_ITEM_KB * 1024
+)
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(
+        (tag[2:] if tag.startswith("W/") else tag) == etag
+        for tag in candidates
+    )
+
+def _not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            return False
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``bytes=`` range; returns (start, end) inclusive.
+
+    Raises ValueError for unsatisfiable ranges. Multi-range and malformed
+    headers return None so the full body is served instead.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_text, _, end_text = spec.strip().partition("-")
+    if not all(part == "" or part.isdigit() for part in (start_text, end_text)):
+        return None
+    if start_text == "":
+        # Suffix range: the last N bytes
+        if end_text == "":
+            return None
+        length = int(end_text)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(start_text)
+    if end_text and int(end_text) < start:
+        return None
+    if start >= size:
+        raise ValueError("Unsatisfiable range")
+    end = int(end_text) if end_text else size - 1
+    return start, min(end, size - 1)
+
+async def serve_image(request: Request, storage: StorageBackend, key: str) -> Response:
+    """Serve an immutable stored image with validators, conditional and range support."""
+    entry = hot_image_cache.get(key)
+    if entry is not None:
+        data, stored = entry
+    else:
+        try:
+            stored = await storage.stat(key)
+        except ValueError:
+            stored = None
+        if stored is None:
+            raise HTTPException(status_code=404, detail="Image not found")
+        try:
+            data = await storage.read(key)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Image not found")
+        hot_image_cache.put(key, data, stored)
+
+    media_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+    return immutable_image_response(request, data, stored.etag, media_type, stored.last_modified)
+
+def immutable_image_response(
+    request: Request,
+    data: bytes,
+    etag: str,
+    media_type: str,
+    last_modified: Optional[datetime] = None
+) -> Response:
+    """Build a cacheable response for immutable image bytes, honouring conditionals and ranges."""
+    etag = f'"{etag}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMAGE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range(range_header, len(data))
+        except ValueError:
+            return Response(
+                status_code=416,
+                headers={**headers, "Content-Range": f"bytes */{len(data)}"}
+            )
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+            return Response(
+                content=data[start:end + 1],
+                status_code=206,
+                media_type=media_type,
+                headers=headers
+            )
+
+    return Response(content=data, media_type=media_type, headers=headers)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, Float, Boolean, Text, ForeignKey
+from sqlalchemy import Column, String, Integer, DateTime, Float, Boolean, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -31,6 +31,11 @@ class Image(Base):
     
     user = relationship("User", back_populates="images")
     payment = relationship("Payment", back_populates="image", uselist=False)
+    
+    __table_args__ = (
+        # Keyset pagination of a user's gallery, newest first
+        Index("ix_images_user_id_created_at", user_id, created_at.desc(), id.desc()),
+    )
 
 class Payment(Base):
     __tablename__ = "payments"
@@ -47,3 +52,22 @@ class Payment(Base):
     
     user = relationship("User", back_populates="payments")
     image = relationship("Image", back_populates="payment")
+
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+    
+    id = Column(String, primary_key=True, index=True)  # UUID hex
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    status = Column(String, default="queued", index=True)  # queued, running, completed, failed
+    request = Column(Text, nullable=False)  # JSON GenerateImageRequest payload
+    image_id = Column(Integer, ForeignKey("images.id"), nullable=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+    lease_owner = Column(String, nullable=True)  # worker process running the job
+    lease_expires = Column(DateTime, nullable=True)  # renewed while running; expired = worker died
+    
+    user = relationship("User")
+    image = relationship("Image", lazy="selectin")  # Always loaded, async sessions can't lazy-load
@@ -1,7 +1,9 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, Dict, Any
+from pydantic import BaseModel, EmailStr, Field, field_validator
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
+from services.ai_models_config import REQUESTABLE_MODELS
+
 # Auth Schemas
 class UserRegister(BaseModel):
     email: EmailStr
@@ -37,7 +39,14 @@ class ImageCustomization(BaseModel):
 
 class GenerateImageRequest(BaseModel):
     customization: ImageCustomization
-    ai_model: str = Field(default="gemini", description="AI model to use: gemini, dalle")
+    ai_model: str = Field(default="gemini", description="AI model to use: gemini, dalle, dalle2")
+
+    @field_validator("ai_model")
+    @classmethod
+    def check_ai_model(cls, value: str) -> str:
+        if value not in REQUESTABLE_MODELS:
+            raise ValueError(f"Unsupported AI model: {value}. Available models: {', '.join(REQUESTABLE_MODELS)}")
+        return value
 
 class ImageResponse(BaseModel):
     id: int
@@ -50,12 +59,44 @@ class ImageResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class ImagePage(BaseModel):
+    items: List[ImageResponse]
+    next_cursor: Optional[str] = None
+
+class BatchGenerateRequest(BaseModel):
+    items: List[GenerateImageRequest] = Field(..., min_length=1, description="One entry per image to generate")
+
+class BatchItemResult(BaseModel):
+    index: int
+    status: str  # succeeded, failed
+    image: Optional[ImageResponse] = None
+    error: Optional[str] = None
+
+class BatchGenerateResponse(BaseModel):
+    items: List[BatchItemResult]
+    succeeded: int
+    failed: int
+
+class GenerationJobResponse(BaseModel):
+    job_id: str
+    status: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    attempts: int = 0
+    error: Optional[str] = None
+    image: Optional[ImageResponse] = None
+
 class VerifyImageResponse(BaseModel):
     valid: bool
     serial: Optional[str] = None
     created_at: Optional[datetime] = None
     image_url_verified: Optional[str] = None
     user_email: Optional[str] = None
+    signed: bool = False  # confirmed by the QR signature, without a database lookup
+
+class BulkVerifyRequest(BaseModel):
+    serials: List[str] = Field(..., min_length=1, description="Serials to verify, answered in this order")
 
 # Payment Schemas (TODO: Implement Stripe integration)
 class CreatePaymentIntent(BaseModel):
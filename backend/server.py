@@ -1,31 +1,51 @@
-from fastapi import FastAPI, Depends, HTTPException, status, File, UploadFile
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, status, File, UploadFile
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 import os
 import json
 from dotenv import load_dotenv
 
-from database import get_db, init_db
-from models import User, Image, Payment
+from database import AsyncSessionLocal, ReadSessionLocal, get_db, get_read_db, init_db, close_db
+from models import User, Image, Payment, GenerationJob
 from schemas import (
     UserRegister, UserLogin, Token, UserResponse,
-    GenerateImageRequest, ImageResponse, VerifyImageResponse,
-    CreatePaymentIntent, PaymentResponse
+    GenerateImageRequest, ImageResponse, ImagePage, GenerationJobResponse,
+    BatchGenerateRequest, BatchItemResult, BatchGenerateResponse,
+    VerifyImageResponse, BulkVerifyRequest, CreatePaymentIntent, PaymentResponse
 )
+from image_delivery import serve_image, immutable_image_response, hot_image_cache
 from auth import (
-    get_password_hash, verify_password, create_access_token,
-    get_current_user, get_optional_user
+    hash_password, verify_and_update_password, password_hashing_stats,
+    create_access_token, get_current_user, get_optional_user, principal_cache
+)
+from services.generation_pipeline import GenerationPipeline
+from services.job_queue import job_queue, QueueFullError
+from services.job_events import job_events, TERMINAL_EVENTS
+from services.image_generator import close_image_generator
+from services.compute_pool import compute_pool
+from services.provider_router import provider_router
+from services.generation_cache import generation_cache
+from services.storage import get_storage
+from services.derivatives import derivative_service, DERIVATIVE_FORMATS
+from services.verification import verification_service
+from services.pagination import encode_cursor, decode_cursor
+from services.metrics import METRICS_ENABLED, MetricsMiddleware, loop_lag_monitor, registry
+from services.rate_limiter import (
+    generation_admission, RateLimitExceeded, CapacityExceeded, retry_after_header
 )
-from services.image_generator import ImageGeneratorService
-from services.serial_generator import SerialGenerator
-from services.qr_generator import QRGenerator
-from services.image_composer import ImageComposer
 
 load_dotenv()
 
+JOB_EVENTS_HEARTBEAT_SECONDS = float(os.getenv("JOB_EVENTS_HEARTBEAT_SECONDS", "15"))
+GENERATION_BATCH_MAX_ITEMS = int(os.getenv("GENERATION_BATCH_MAX_ITEMS", "50"))
+VERIFY_BULK_MAX_SERIALS = int(os.getenv("VERIFY_BULK_MAX_SERIALS", "5000"))
+# A valid signature never stops being valid, so signed answers can be cached anywhere
+SIGNED_VERIFY_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
 app = FastAPI(title="I'm Rich AI API", version="1.0.0")
 
 # CORS Configuration
@@ -41,22 +61,78 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
-# Create generated images directory
-os.makedirs("/app/generated", exist_ok=True)
-
-# Mount static files for serving generated images
-app.mount("/images", StaticFiles(directory="/app/generated"), name="images")
+# Scrape-time gauges for queues and executors
+_CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+registry.gauge(
+    "imrich_generation_queue_depth", "Generation jobs waiting for a worker",
+    lambda: [({}, job_queue.depth)]
+)
+registry.gauge(
+    "imrich_compute_pool_tasks", "Compute pool tasks by state",
+    lambda: [
+        ({"state": "in_flight"}, compute_pool.stats()["in_flight"]),
+        ({"state": "queued"}, compute_pool.stats()["queued"]),
+    ],
+    ("state",)
+)
+registry.gauge(
+    "imrich_generation_in_flight", "Generation pipelines holding an admission slot",
+    lambda: [({}, generation_admission.in_flight)]
+)
+registry.gauge(
+    "imrich_password_hash_pending", "Password hash operations queued or running",
+    lambda: [({}, password_hashing_stats()["pending"])]
+)
+registry.gauge(
+    "imrich_provider_circuit_state", "Provider circuit breaker state (0 closed, 1 half-open, 2 open)",
+    lambda: [
+        ({"model": model}, _CIRCUIT_STATES[health.state])
+        for model, health in provider_router.health.items()
+    ],
+    ("model",)
+)
 
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
-    init_db()
+    await init_db()
+    get_storage()  # Fail fast on storage misconfiguration
+    compute_pool.start()
+    await verification_service.start()
+    await job_queue.start()
+    loop_lag_monitor.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await loop_lag_monitor.stop()
+    await job_queue.stop()
+    await verification_service.stop()
+    await close_db()
+    await close_image_generator()
+    compute_pool.shutdown()
 
 # Health check
 @app.get("/api/health")
 async def health_check():
-    return {"status": "healthy", "service": "I'm Rich AI API"}
+    return {
+        "status": "healthy",
+        "service": "I'm Rich AI API",
+        "generation_queue_depth": job_queue.depth,
+        "compute_pool": compute_pool.stats(),
+        "generation_cache": generation_cache.stats(),
+        "image_memory_cache": hot_image_cache.stats(),
+        "password_hashing": password_hashing_stats(),
+        "generation_admission": generation_admission.stats()
+    }
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text-format metrics for this worker process."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/api/models")
 async def list_models():
@@ -67,9 +143,12 @@ async def list_models():
 # ==================== Authentication Endpoints ====================
 
 @app.post("/api/auth/register", response_model=Token)
-async def register(user_data: UserRegister, db: Session = Depends(get_db)):
+async def register(user_data: UserRegister, db: AsyncSession = Depends(get_db)):
+    # Hash before touching the database so the writer connection isn't held meanwhile
+    hashed_password = await hash_password(user_data.password)
+    
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await db.scalar(select(User).where(User.email == user_data.email))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -77,7 +156,6 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
     new_user = User(
         email=user_data.email,
         password_hash=hashed_password,
@@ -85,26 +163,39 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
         last_name=user_data.last_name
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
     
     # Create access token
-    access_token = create_access_token(data={"sub": new_user.id})
+    access_token = create_access_token(data={"sub": str(new_user.id)})
     
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/api/auth/login", response_model=Token)
-async def login(user_data: UserLogin, db: Session = Depends(get_db)):
+async def login(user_data: UserLogin, db: AsyncSession = Depends(get_read_db)):
     # Find user
-    user = db.query(User).filter(User.email == user_data.email).first()
-    if not user or not verify_password(user_data.password, user.password_hash):
+    user = await db.scalar(select(User).where(User.email == user_data.email))
+    valid, new_hash = False, None
+    if user:
+        valid, new_hash = await verify_and_update_password(user_data.password, user.password_hash)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
         )
     
+    # Upgrade hashes created with outdated bcrypt parameters
+    if new_hash:
+        try:
+            async with AsyncSessionLocal() as write_db:
+                # ORM update so the principal cache sees the change
+                stored_user = await write_db.get(User, user.id)
+                stored_user.password_hash = new_hash
+                await write_db.commit()
+        except Exception as e:
+            print(f"Warning: could not rehash password for user {user.id}: {e}")
+    
     # Create access token
-    access_token = create_access_token(data={"sub": user.id})
+    access_token = create_access_token(data={"sub": str(user.id)})
     
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -132,133 +223,378 @@ async def get_me(current_user: User = Depends(get_current_user)):
 
 # ==================== Image Generation Endpoints ====================
 
+def build_image_response(image: Image) -> ImageResponse:
+    return ImageResponse(
+        id=image.id,
+        serial=image.serial,
+        image_url_verified=f"/api/images/{image.serial}_verified.jpg",
+        image_url_wallpaper=f"/api/images/{image.serial}_wallpaper.jpg",
+        created_at=image.created_at,
+        payment_status=image.payment_status
+    )
+
+def build_job_response(job: GenerationJob) -> GenerationJobResponse:
+    return GenerationJobResponse(
+        job_id=job.id,
+        status=job.status,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        completed_at=job.completed_at,
+        attempts=job.attempts or 0,
+        error=job.error,
+        image=build_image_response(job.image) if job.image else None
+    )
+
+async def admit_generation(user_id: int, cost: int = 1):
+    """Charge ``cost`` generations to the user's rate limit (429 when exhausted)."""
+    try:
+        await generation_admission.check_rate(user_id, cost)
+    except RateLimitExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": retry_after_header(e.retry_after)}
+        )
+
 @app.post("/api/generate-image", response_model=ImageResponse)
 async def generate_image(
     request: GenerateImageRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
+    await admit_generation(current_user.id)
     try:
-        # Initialize image generator service
-        generator = ImageGeneratorService()
-        
-        # Generate unique serial
-        serial = SerialGenerator.generate()
-        
-        # Generate AI image
-        customization_dict = request.customization.dict()
-        base_image_bytes = await generator.generate_image(
-            customization=customization_dict,
-            model=request.ai_model
-        )
-        
-        # Generate QR code
-        base_url = os.getenv("BASE_URL", "http://localhost:3000")
-        verification_url = f"{base_url}/verify/{serial}"
-        qr_image = QRGenerator.generate(verification_url)
-        
-        # Create two versions of the image
-        # 1. Verified version (with QR + serial)
-        verified_image_bytes = ImageComposer.create_verified_image(
-            base_image_bytes, qr_image, serial
-        )
-        
-        # 2. Wallpaper version (clean, no QR/serial)
-        wallpaper_image_bytes = ImageComposer.create_wallpaper_image(base_image_bytes)
-        
-        # Save images
-        verified_path = f"/app/generated/{serial}_verified.jpg"
-        wallpaper_path = f"/app/generated/{serial}_wallpaper.jpg"
-        
-        with open(verified_path, "wb") as f:
-            f.write(verified_image_bytes)
-        
-        with open(wallpaper_path, "wb") as f:
-            f.write(wallpaper_image_bytes)
-        
-        # Store in database
-        prompt_used = generator.get_prompt_for_record(customization_dict)
-        new_image = Image(
-            user_id=current_user.id,
-            serial=serial,
-            image_path_verified=verified_path,
-            image_path_wallpaper=wallpaper_path,
-            prompt=prompt_used,
-            customization=json.dumps(customization_dict),
-            payment_status="pending"  # Will be updated after payment
-        )
-        db.add(new_image)
-        db.commit()
-        db.refresh(new_image)
-        
-        # TODO: Send email with images
-        # await send_email_with_images(
-        #     to=current_user.email,
-        #     serial=serial,
-        #     verified_image_path=verified_path,
-        #     wallpaper_image_path=wallpaper_path
-        # )
-        
-        return ImageResponse(
-            id=new_image.id,
-            serial=new_image.serial,
-            image_url_verified=f"/api/images/{serial}_verified.jpg",
-            image_url_wallpaper=f"/api/images/{serial}_wallpaper.jpg",
-            created_at=new_image.created_at,
-            payment_status=new_image.payment_status
-        )
+        async with generation_admission.slot():
+            new_image = await GenerationPipeline.run(
+                db,
+                user_id=current_user.id,
+                customization=request.customization.dict(),
+                ai_model=request.ai_model
+            )
+        return build_image_response(new_image)
     
+    except CapacityExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": retry_after_header(e.retry_after)}
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error generating image: {str(e)}"
         )
 
+@app.post("/api/generate-image/batch", response_model=BatchGenerateResponse)
+async def generate_image_batch(
+    request: BatchGenerateRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Generate several images in one call and report each item's outcome.
+
+    Every item is charged to the user's rate limit, all or nothing, so a
+    batch never buys more images than the same number of single requests.
+    Its size is capped by GENERATION_BATCH_MAX_ITEMS and by the rate
+    limit's burst.
+    """
+    max_items = GENERATION_BATCH_MAX_ITEMS
+    if generation_admission.max_cost is not None:
+        max_items = min(max_items, int(generation_admission.max_cost))
+    if len(request.items) > max_items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch can contain at most {max_items} items"
+        )
+    await admit_generation(current_user.id, cost=len(request.items))
+    outcomes = await GenerationPipeline.run_batch(
+        db,
+        user_id=current_user.id,
+        items=[(item.customization.dict(), item.ai_model) for item in request.items]
+    )
+
+    items = []
+    for index, outcome in enumerate(outcomes):
+        if isinstance(outcome, Exception):
+            items.append(BatchItemResult(index=index, status="failed", error=f"Error generating image: {outcome}"))
+        else:
+            items.append(BatchItemResult(index=index, status="succeeded", image=build_image_response(outcome)))
+    succeeded = sum(1 for item in items if item.status == "succeeded")
+    return BatchGenerateResponse(items=items, succeeded=succeeded, failed=len(items) - succeeded)
+
+@app.post(
+    "/api/generate-image/jobs",
+    response_model=GenerationJobResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
+async def enqueue_generate_image(
+    request: GenerateImageRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Queue an image generation and return immediately with a job id."""
+    await admit_generation(current_user.id)
+    try:
+        job = await job_queue.submit(db, current_user.id, request.dict())
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "5"}
+        )
+    return build_job_response(job)
+
+@app.get("/api/generate-image/jobs", response_model=List[GenerationJobResponse])
+async def list_generation_jobs(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """List the current user's generation jobs, newest first."""
+    result = await db.execute(
+        select(GenerationJob).where(
+            GenerationJob.user_id == current_user.id
+        ).order_by(GenerationJob.created_at.desc()).limit(50)
+    )
+    jobs = result.scalars().all()
+    return [build_job_response(job) for job in jobs]
+
+@app.get("/api/generate-image/jobs/{job_id}", response_model=GenerationJobResponse)
+async def get_generation_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Poll the status and result of a generation job."""
+    job = await db.scalar(
+        select(GenerationJob).where(
+            GenerationJob.id == job_id,
+            GenerationJob.user_id == current_user.id
+        )
+    )
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return build_job_response(job)
+
+async def load_generation_job(job_id: str, user_id: int) -> Optional[GenerationJob]:
+    async with ReadSessionLocal() as db:
+        return await db.scalar(
+            select(GenerationJob).where(
+                GenerationJob.id == job_id,
+                GenerationJob.user_id == user_id
+            )
+        )
+
+def format_sse(event: str, data, event_id: Optional[int] = None) -> str:
+    message = f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+    return f"id: {event_id}\n{message}" if event_id is not None else message
+
+@app.get("/api/generate-image/jobs/{job_id}/events")
+async def stream_generation_job(
+    job_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """Stream a job's progress as Server-Sent Events.
+
+    Emits the current status, then stage events (queued, running,
+    provider_started, base_image_received, preview, composed, stored) and
+    finally a completed/failed event carrying the full job response.
+    Reconnecting clients can send Last-Event-ID to skip events already seen.
+    """
+    job = await load_generation_job(job_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    try:
+        last_event_id = int(request.headers.get("last-event-id", "0"))
+    except ValueError:
+        last_event_id = 0
+
+    async def events():
+        current = job
+        if current.status not in TERMINAL_EVENTS:
+            yield format_sse("status", build_job_response(current))
+            subscription = job_events.subscribe(
+                job_id, after=last_event_id, timeout=JOB_EVENTS_HEARTBEAT_SECONDS
+            )
+            async for item in subscription:
+                if item is None:
+                    # Also catches jobs that finished in another worker process
+                    current = await load_generation_job(job_id, current_user.id)
+                    if current is None or current.status in TERMINAL_EVENTS:
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                sequence, event, data = item
+                if event in TERMINAL_EVENTS:
+                    current = await load_generation_job(job_id, current_user.id)
+                    break
+                yield format_sse(event, data, sequence)
+            await subscription.aclose()
+        if current is not None:
+            yield format_sse(current.status, build_job_response(current))
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/api/images/{filename}")
-async def get_image(filename: str):
+async def get_image(filename: str, request: Request):
     """Serve generated images."""
-    file_path = f"/app/generated/{filename}"
-    if not os.path.exists(file_path):
+    return await serve_image(request, get_storage(), filename)
+
+@app.get("/api/images/{serial}/{variant}")
+async def get_image_derivative(
+    serial: str,
+    variant: str,
+    request: Request,
+    w: int = Query(..., description="Target width in pixels (must be an allowed size)"),
+    fmt: str = Query("jpeg", description="Output format: jpeg, webp")
+):
+    """Serve a resized derivative (thumbnail/preview) of a generated image."""
+    try:
+        data, key = await derivative_service.get(get_storage(), serial, variant, w, fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Image not found")
-    return FileResponse(file_path)
+    return immutable_image_response(request, data, key, DERIVATIVE_FORMATS[fmt])
+
+@app.get("/images/{filename}")
+async def get_static_image(filename: str, request: Request):
+    """Legacy static path for generated images."""
+    return await serve_image(request, get_storage(), filename)
 
 @app.get("/api/verify/{serial}", response_model=VerifyImageResponse)
-async def verify_image(serial: str, db: Session = Depends(get_db)):
-    """Verify if an image serial is authentic."""
-    image = db.query(Image).filter(Image.serial == serial).first()
+async def verify_image(
+    serial: str,
+    response: Response,
+    sig: Optional[str] = None,
+    include_owner: bool = False,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Verify if an image serial is authentic.
+
+    ``sig`` is the signature from a signed QR link; when it checks out the
+    answer comes without a database lookup, unless ``include_owner`` asks for
+    the owner's email. A missing or invalid signature falls back to the
+    database. Either way ``created_at`` is the time embedded in the serial,
+    which is what new image rows store as their creation time.
+    """
+    issued_at = verification_service.verify_signature(serial, sig) if sig else None
+    if issued_at is not None and not include_owner:
+        response.headers["Cache-Control"] = SIGNED_VERIFY_CACHE_CONTROL
+        return VerifyImageResponse(
+            valid=True,
+            serial=serial,
+            created_at=issued_at,
+            image_url_verified=f"/api/images/{serial}_verified.jpg",
+            signed=True
+        )
+
+    record = await verification_service.verify(db, serial)
     
-    if not image:
+    if not record:
         return VerifyImageResponse(valid=False)
     
-    user = db.query(User).filter(User.id == image.user_id).first()
-    
     return VerifyImageResponse(
         valid=True,
-        serial=image.serial,
-        created_at=image.created_at,
+        serial=record["serial"],
+        created_at=record["created_at"],
         image_url_verified=f"/api/images/{serial}_verified.jpg",
-        user_email=user.email if user else None
+        user_email=record["user_email"],
+        signed=issued_at is not None
     )
 
-@app.get("/api/my-images", response_model=List[ImageResponse])
+@app.post("/api/verify/bulk")
+async def verify_images_bulk(request: BulkVerifyRequest):
+    """Verify many serials at once.
+
+    Streams one JSON object per serial (NDJSON, in request order) as each
+    chunk of serials is resolved, so the first results arrive before the
+    whole batch has been looked up.
+    """
+    if len(request.serials) > VERIFY_BULK_MAX_SERIALS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {VERIFY_BULK_MAX_SERIALS} serials can be verified per request"
+        )
+
+    async def results():
+        # Own session: the response outlives the request's dependencies
+        async with ReadSessionLocal() as db:
+            async for chunk in verification_service.verify_many(db, request.serials):
+                lines = []
+                for serial, record in chunk:
+                    if record is None:
+                        item = {"serial": serial, "valid": False}
+                    else:
+                        item = {
+                            "serial": serial,
+                            "valid": True,
+                            "created_at": record["created_at"].isoformat() if record["created_at"] else None,
+                            "image_url_verified": f"/api/images/{serial}_verified.jpg",
+                            "user_email": record["user_email"],
+                        }
+                    lines.append(json.dumps(item))
+                yield "\n".join(lines) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@app.get("/api/stats/verification")
+async def verification_stats():
+    """Verification cache and negative-filter counters."""
+    return verification_service.stats()
+
+@app.get("/api/stats/providers")
+async def provider_stats():
+    """Per-model latency, error rate and circuit breaker state."""
+    return provider_router.stats()
+
+@app.get("/api/stats/auth")
+async def auth_stats():
+    """Authenticated-principal cache counters."""
+    return principal_cache.stats()
+
+@app.get("/api/my-images", response_model=ImagePage)
 async def get_my_images(
+    limit: int = Query(24, ge=1, le=100),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get all images for the current user."""
-    images = db.query(Image).filter(Image.user_id == current_user.id).order_by(Image.created_at.desc()).all()
+    """Get the current user's images, newest first, one page at a time."""
+    query = select(Image).where(Image.user_id == current_user.id)
     
-    return [
-        ImageResponse(
-            id=img.id,
-            serial=img.serial,
-            image_url_verified=f"/api/images/{img.serial}_verified.jpg",
-            image_url_wallpaper=f"/api/images/{img.serial}_wallpaper.jpg",
-            created_at=img.created_at,
-            payment_status=img.payment_status
-        )
-        for img in images
-    ]
+    if cursor:
+        try:
+            created_at, last_id = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.where(or_(
+            Image.created_at < created_at,
+            and_(Image.created_at == created_at, Image.id < last_id)
+        ))
+    
+    # Fetch one extra row to know whether another page exists
+    result = await db.execute(
+        query.order_by(Image.created_at.desc(), Image.id.desc()).limit(limit + 1)
+    )
+    images = result.scalars().all()
+    
+    next_cursor = None
+    if len(images) > limit:
+        images = images[:limit]
+        next_cursor = encode_cursor(images[-1].created_at, images[-1].id)
+    
+    return ImagePage(
+        items=[build_image_response(img) for img in images],
+        next_cursor=next_cursor
+    )
 
 # ==================== Payment Endpoints (TODO: Stripe Integration) ====================
 
@@ -266,7 +602,7 @@ async def get_my_images(
 async def create_payment_intent(
     payment_data: CreatePaymentIntent,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a Stripe payment intent."""
     # TODO: Implement Stripe payment intent creation
@@ -289,7 +625,7 @@ async def create_payment_intent(
     )
 
 @app.post("/api/payments/webhook")
-async def stripe_webhook(db: Session = Depends(get_db)):
+async def stripe_webhook(db: AsyncSession = Depends(get_db)):
     """Handle Stripe webhook events."""
     # TODO: Implement Stripe webhook handler
     # 
@@ -309,13 +645,15 @@ async def stripe_webhook(db: Session = Depends(get_db)):
 async def get_payment(
     payment_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get payment details."""
-    payment = db.query(Payment).filter(
-        Payment.id == payment_id,
-        Payment.user_id == current_user.id
-    ).first()
+    payment = await db.scalar(
+        select(Payment).where(
+            Payment.id == payment_id,
+            Payment.user_id == current_user.id
+        )
+    )
     
     if not payment:
         raise HTTPException(status_code=404, detail="Payment not found")
@@ -28,6 +28,8 @@ AI_MODELS = {
         "supported_sizes": ["1024x1024", "1024x1792", "1792x1024"],
         "default_size": "1024x1792",
         "cost_per_image": 0.080,  # HD quality
+        "max_images_per_request": 1,  # provider rejects n > 1
+        "fallbacks": ["dalle2"],  # tried in order when this model is failing or too slow
     },
     "dalle2": {
         "name": "DALL-E 2",
@@ -38,6 +40,7 @@ AI_MODELS = {
         "supported_sizes": ["1024x1024"],
         "default_size": "1024x1024",
         "cost_per_image": 0.020,
+        "max_images_per_request": 10,
     },
     # Add more models here as needed:
     # "midjourney": {...},
@@ -45,6 +48,11 @@ AI_MODELS = {
     # "firefly": {...},
 }
 
+# Accepted in generation requests: every configured model, plus gemini, which
+# answers with setup instructions. Anything else is rejected up front, so
+# client input never becomes a metric label or provider health entry.
+REQUESTABLE_MODELS = ["gemini", *AI_MODELS]
+
 def get_model_config(model_name: str):
     """Get configuration for a specific model."""
     if model_name not in AI_MODELS:
@@ -0,0 +1,68 @@
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+class ComputePool:
+    """Process pool for CPU-bound image work (QR, composition, JPEG encoding).
+
+    ``COMPOSE_WORKERS=0`` runs tasks on the default thread executor instead,
+    which is handy for development on small machines.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_concurrency: Optional[int] = None):
+        if workers is None:
+            workers = int(os.getenv("COMPOSE_WORKERS", str(os.cpu_count() or 1)))
+        self.workers = workers
+        self.max_concurrency = max_concurrency or int(
+            os.getenv("COMPOSE_MAX_CONCURRENCY", str(max(self.workers, 1) * 2))
+        )
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.waiting = 0
+
+    def start(self):
+        if self.workers > 0 and self._executor is None:
+            # spawn avoids forking a process that already runs an event loop and threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run ``fn`` in the pool, waiting for a slot when the concurrency limit is reached."""
+        if self._semaphore is None:
+            self.start()
+
+        loop = asyncio.get_running_loop()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        try:
+            return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queued": self.waiting,
+        }
+
+compute_pool = ComputePool()
@@ -0,0 +1,125 @@
+import os
+import asyncio
+import hashlib
+from typing import Dict, List, Optional, Set, Tuple
+
+from services.compute_pool import compute_pool
+from services.disk_cache import DiskLRUCache
+from services.image_tasks import render_derivative
+from services.storage import StorageBackend
+
+DERIVATIVE_FORMATS = {
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+}
+DERIVATIVE_VARIANTS = ("verified", "wallpaper")
+# Part of every derivative's cache key and ETag; bump when render_derivative's output changes
+DERIVATIVE_RENDER_VERSION = 1
+
+def _parse_sizes(value: str) -> List[Tuple[int, str]]:
+    """Parse "512:webp,256:jpeg" into [(512, "webp"), (256, "jpeg")]."""
+    sizes = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        width, _, fmt = item.partition(":")
+        sizes.append((int(width), fmt or "jpeg"))
+    return sizes
+
+class DerivativeService:
+    """Resized/re-encoded copies of stored images, rendered on first request.
+
+    Only whitelisted widths and formats are accepted so the cache key space
+    stays small. Rendered derivatives live in a size-bounded disk LRU.
+    """
+
+    def __init__(self):
+        self.widths: Set[int] = {
+            int(width) for width in os.getenv("DERIVATIVE_WIDTHS", "256,512,768").split(",") if width.strip()
+        }
+        self.quality = int(os.getenv("DERIVATIVE_QUALITY", "80"))
+        self.directory = os.getenv("DERIVATIVE_CACHE_DIR", "/app/cache/derivatives")
+        self.max_bytes = int(os.getenv("DERIVATIVE_CACHE_MAX_MB", "512")) * 1024 * 1024
+        self.pregenerate_sizes = _parse_sizes(os.getenv("DERIVATIVE_PREGENERATE", ""))
+        self._cache: Optional[DiskLRUCache] = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+
+    @property
+    def cache(self) -> DiskLRUCache:
+        if self._cache is None:
+            self._cache = DiskLRUCache(self.directory, self.max_bytes)
+        return self._cache
+
+    def validate(self, variant: str, width: int, fmt: str):
+        if variant not in DERIVATIVE_VARIANTS:
+            raise ValueError(f"Unknown variant: {variant}. Available variants: {list(DERIVATIVE_VARIANTS)}")
+        if width not in self.widths:
+            raise ValueError(f"Unsupported width: {width}. Allowed widths: {sorted(self.widths)}")
+        if fmt not in DERIVATIVE_FORMATS:
+            raise ValueError(f"Unsupported format: {fmt}. Allowed formats: {list(DERIVATIVE_FORMATS)}")
+
+    def cache_key(self, serial: str, variant: str, width: int, fmt: str) -> str:
+        # Encoding settings are part of the key: responses are immutable, so
+        # a new DERIVATIVE_QUALITY must not be served under an old ETag
+        name = f"{serial}_{variant}_w{width}_q{self.quality}_r{DERIVATIVE_RENDER_VERSION}.{fmt}"
+        return hashlib.sha256(name.encode("utf-8")).hexdigest()
+
+    async def get(
+        self,
+        storage: StorageBackend,
+        serial: str,
+        variant: str,
+        width: int,
+        fmt: str
+    ) -> Tuple[bytes, str]:
+        """Return (bytes, cache key) for a derivative, rendering it if needed.
+
+        Raises ValueError for non-whitelisted parameters and FileNotFoundError
+        when the original image does not exist.
+        """
+        self.validate(variant, width, fmt)
+        key = self.cache_key(serial, variant, width, fmt)
+
+        data = await asyncio.to_thread(self.cache.get, key)
+        if data is not None:
+            return data, key
+
+        # Concurrent first requests for the same derivative share one render
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(
+                self._render(storage, f"{serial}_{variant}.jpg", key, width, fmt)
+            )
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task), key
+
+    async def _render(self, storage: StorageBackend, source_key: str, key: str, width: int, fmt: str) -> bytes:
+        source = await storage.read(source_key)
+        data = await compute_pool.run(render_derivative, source, width, fmt, self.quality)
+        await asyncio.to_thread(self.cache.put, key, data)
+        return data
+
+    def schedule_pregeneration(self, serial: str, originals: Dict[str, bytes]):
+        """Render the configured DERIVATIVE_PREGENERATE sizes in the background."""
+        if not self.pregenerate_sizes:
+            return
+        task = asyncio.create_task(self._pregenerate(serial, originals))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _pregenerate(self, serial: str, originals: Dict[str, bytes]):
+        for variant, source in originals.items():
+            for width, fmt in self.pregenerate_sizes:
+                try:
+                    self.validate(variant, width, fmt)
+                    data = await compute_pool.run(render_derivative, source, width, fmt, self.quality)
+                    await asyncio.to_thread(
+                        self.cache.put, self.cache_key(serial, variant, width, fmt), data
+                    )
+                except Exception as e:
+                    print(f"Warning: derivative pre-generation failed for {serial}: {e}")
+
+derivative_service = DerivativeService()
@@ -0,0 +1,99 @@
+import os
+import time
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+class DiskLRUCache:
+    """Size-bounded, least-recently-used cache of byte blobs on local disk.
+
+    Entries live in two-character shard directories under ``directory``.
+    Writes go to a temp file and are renamed into place, so readers never
+    see partial entries. The recency order is kept in memory and rebuilt
+    from file modification times on startup. Methods block on file I/O;
+    async callers should go through ``asyncio.to_thread``.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _load_index(self):
+        found = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith("."):
+                    continue  # leftover temp file
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                found.append((stat.st_mtime, name, stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self.total_bytes += size
+        self._evict()
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[bytes]:
+        """Return the cached bytes, or None when missing or older than ``max_age`` seconds."""
+        path = self._path(key)
+        try:
+            if max_age is not None and time.time() - os.stat(path).st_mtime > max_age:
+                return None
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                size = self._entries.pop(key, None)
+                if size is not None:
+                    self.total_bytes -= size
+            return None
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return data
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous
+            self._entries[key] = len(data)
+            self.total_bytes += len(data)
+            self._evict()
+
+    def _evict(self):
+        # Caller holds the lock (or is still in __init__)
+        while self.total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.unlink(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def __len__(self) -> int:
+        return len(self._entries)
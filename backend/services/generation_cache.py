@@ -0,0 +1,136 @@
+import os
+import asyncio
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional
+
+from services.disk_cache import DiskLRUCache
+
+class CacheUsage:
+    """Whether a lookup inside ``track_cache_usage()`` was answered without a provider call."""
+
+    def __init__(self):
+        self.served_from_cache = False
+
+_usage: ContextVar[Optional[CacheUsage]] = ContextVar("generation_cache_usage", default=None)
+
+@contextmanager
+def track_cache_usage() -> Iterator[CacheUsage]:
+    """Report whether generation cache lookups in this block hit the cache or an in-flight call."""
+    usage = CacheUsage()
+    token = _usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _usage.reset(token)
+
+def _served_from_cache():
+    usage = _usage.get()
+    if usage is not None:
+        usage.served_from_cache = True
+
+class GenerationCache:
+    """Content-addressed cache of provider base images.
+
+    Entries are keyed by hash(prompt, model, size). Concurrent requests for
+    the same key share one provider call. Reuse is bounded by
+    ``GENERATION_CACHE_MAX_AGE_SECONDS`` (regenerate older entries) and
+    ``GENERATION_CACHE_MAX_REUSE`` (regenerate after N cache hits, 0 means
+    unlimited).
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("GENERATION_CACHE_ENABLED", "false").lower() == "true"
+        self.directory = os.getenv("GENERATION_CACHE_DIR", "/app/cache/generations")
+        self.max_bytes = int(os.getenv("GENERATION_CACHE_MAX_MB", "1024")) * 1024 * 1024
+        max_age = os.getenv("GENERATION_CACHE_MAX_AGE_SECONDS")
+        self.max_age = float(max_age) if max_age else None
+        self.max_reuse = int(os.getenv("GENERATION_CACHE_MAX_REUSE", "0"))
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._store: Optional[DiskLRUCache] = None
+        self._reuse_counts: Dict[str, int] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def make_key(prompt: str, model: str, size: str) -> str:
+        return hashlib.sha256(f"{model}\0{size}\0{prompt}".encode("utf-8")).hexdigest()
+
+    @property
+    def store(self) -> DiskLRUCache:
+        if self._store is None:
+            self._store = DiskLRUCache(self.directory, self.max_bytes)
+        return self._store
+
+    async def get_or_generate(
+        self,
+        prompt: str,
+        model: str,
+        size: str,
+        generate: Callable[[], Awaitable[bytes]]
+    ) -> bytes:
+        """Return cached bytes for the key or run ``generate`` once for all concurrent callers."""
+        if not self.enabled:
+            return await generate()
+
+        key = self.make_key(prompt, model, size)
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            _served_from_cache()
+            return await asyncio.shield(task)
+
+        cached = await self._lookup(key)
+        if cached is not None:
+            self.hits += 1
+            _served_from_cache()
+            return cached
+
+        # Re-check: another caller may have started while we read the disk
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            _served_from_cache()
+            return await asyncio.shield(task)
+
+        self.misses += 1
+        task = asyncio.ensure_future(self._fill(key, generate))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one cancelled caller doesn't cancel the shared provider call
+        return await asyncio.shield(task)
+
+    async def _lookup(self, key: str) -> Optional[bytes]:
+        if self.max_reuse and self._reuse_counts.get(key, 0) >= self.max_reuse:
+            return None
+        data = await asyncio.to_thread(self.store.get, key, self.max_age)
+        if data is not None:
+            self._reuse_counts[key] = self._reuse_counts.get(key, 0) + 1
+        return data
+
+    async def _fill(self, key: str, generate: Callable[[], Awaitable[bytes]]) -> bytes:
+        data = await generate()
+        try:
+            await asyncio.to_thread(self.store.put, key, data)
+        except Exception as e:
+            # The provider call is already paid for; a cache write failure must not lose it
+            print(f"Warning: could not cache generated image {key}: {e}")
+            return data
+        self._reuse_counts[key] = 0
+        return data
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "entries": len(self._store) if self._store is not None else 0,
+            "bytes": self._store.total_bytes if self._store is not None else 0,
+        }
+
+generation_cache = GenerationCache()
@@ -0,0 +1,331 @@
+import os
+import json
+import time
+import base64
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Image
+from services.ai_models_config import AI_MODELS
+from services.image_generator import get_image_generator
+from services.provider_router import provider_router
+from services.serial_generator import SerialGenerator
+from services.compute_pool import compute_pool
+from services.image_tasks import render_generation_images, render_derivative
+from services.storage import get_storage
+from services.derivatives import derivative_service
+from services.verification import verification_service
+from services.metrics import generation_stage_seconds, observe_stages
+from services.rate_limiter import generation_admission
+from services.serial_signing import serial_signer
+
+# Low-resolution preview pushed to progress listeners before composition
+PREVIEW_WIDTH = int(os.getenv("JOB_PREVIEW_WIDTH", "256"))
+PREVIEW_QUALITY = int(os.getenv("JOB_PREVIEW_QUALITY", "60"))
+
+# Fresh serials to try if an insert hits the unique serial index (only possible
+# when two hosts share a SERIAL_WORKER_IDS range)
+SERIAL_COLLISION_RETRIES = int(os.getenv("SERIAL_COLLISION_RETRIES", "2"))
+# Provider requests a single batch may have in flight at once
+BATCH_PROVIDER_CONCURRENCY = int(os.getenv("BATCH_PROVIDER_CONCURRENCY", "4"))
+
+ProgressCallback = Callable[[str, Dict[str, Any]], None]
+BatchResult = Union[Image, Exception]
+
+def build_verification_url(serial: str) -> str:
+    """Verification link encoded in the QR code, carrying a signature when signing is on."""
+    base_url = os.getenv("BASE_URL", "http://localhost:3000")
+    signature = serial_signer.sign(serial)
+    if signature is None:
+        return f"{base_url}/verify/{serial}"
+    return f"{base_url}/verify/{serial}?sig={signature}"
+
+class GenerationPipeline:
+    @staticmethod
+    async def run(
+        db: AsyncSession,
+        user_id: int,
+        customization: Dict[str, Any],
+        ai_model: str,
+        progress: Optional[ProgressCallback] = None
+    ) -> Image:
+        """Run the full generation pipeline and persist the resulting Image row.
+
+        ``progress`` is called with (event, data) as each stage finishes, and
+        with a small JPEG preview as soon as the provider image arrives.
+        """
+        notify = progress or (lambda event, data: None)
+        started = time.perf_counter()
+        # Shared image generator service
+        generator = get_image_generator()
+
+        # Generate unique serial
+        serial = SerialGenerator.generate()
+
+        # Generate AI image, failing over to alternate models if needed
+        notify("provider_started", {"model": ai_model})
+        with generation_stage_seconds.time(stage="provider", model=ai_model):
+            base_image_bytes = await provider_router.generate(
+                customization=customization,
+                model=ai_model
+            )
+        notify("base_image_received", {"serial": serial})
+
+        # Generate QR code and compose both versions off the event loop,
+        # alongside the preview so it isn't held up by composition
+        verification_url = build_verification_url(serial)
+        render_started = time.perf_counter()
+        composition = asyncio.ensure_future(compute_pool.run(
+            render_generation_images, base_image_bytes, verification_url, serial
+        ))
+        if progress is not None:
+            try:
+                preview = await compute_pool.run(
+                    render_derivative, base_image_bytes, PREVIEW_WIDTH, "jpeg", PREVIEW_QUALITY
+                )
+                notify("preview", {
+                    "content_type": "image/jpeg",
+                    "width": PREVIEW_WIDTH,
+                    "data": base64.b64encode(preview).decode("ascii"),
+                })
+            except Exception as e:
+                print(f"Warning: preview rendering failed for {serial}: {e}")
+        verified_image_bytes, wallpaper_image_bytes, timings = await composition
+        # Wall time including the compute pool queue, plus the per-stage split
+        timings["render"] = time.perf_counter() - render_started
+        observe_stages(timings, ai_model)
+        notify("composed", {"serial": serial})
+
+        try:
+            verified_key, wallpaper_key = await GenerationPipeline._store_images(
+                serial, verified_image_bytes, wallpaper_image_bytes, ai_model
+            )
+            originals = {"verified": verified_image_bytes, "wallpaper": wallpaper_image_bytes}
+        except FileExistsError:
+            print(f"Warning: files for serial {serial} already exist, recomposing with a new serial")
+            serial, verified_key, wallpaper_key, originals = await GenerationPipeline._compose_and_store(
+                base_image_bytes, ai_model
+            )
+
+        # Store in database
+        prompt_used = generator.get_prompt_for_record(customization)
+        new_image = GenerationPipeline._build_record(
+            user_id, serial, verified_key, wallpaper_key, prompt_used, customization
+        )
+        db.add(new_image)
+        for attempt in range(SERIAL_COLLISION_RETRIES + 1):
+            try:
+                with generation_stage_seconds.time(stage="db_commit", model=ai_model):
+                    await db.commit()  # id is already populated by the flush
+                break
+            except Exception as e:
+                # The files were created exclusively above, so they are ours to
+                # remove; left behind they would be served, QR signature and all,
+                # for a serial with no row
+                await db.rollback()
+                await GenerationPipeline._discard_images([new_image])
+                # images.serial is the only unique column written here
+                if not isinstance(e, IntegrityError) or attempt == SERIAL_COLLISION_RETRIES:
+                    raise
+                print(f"Warning: serial {serial} already exists, recomposing with a new serial")
+                serial, verified_key, wallpaper_key, originals = await GenerationPipeline._compose_and_store(
+                    base_image_bytes, ai_model
+                )
+                new_image = GenerationPipeline._build_record(
+                    user_id, serial, verified_key, wallpaper_key, prompt_used, customization
+                )
+                db.add(new_image)
+        verification_service.record_serial(serial)
+        # Only once the row exists, so no derivative outlives a failed insert
+        derivative_service.schedule_pregeneration(serial, originals)
+        notify("stored", {"serial": serial, "image_id": new_image.id})
+        generation_stage_seconds.observe(time.perf_counter() - started, stage="total", model=ai_model)
+
+        # TODO: Send email with images
+        # await send_email_with_images(
+        #     to=current_user.email,
+        #     serial=serial,
+        #     verified_image_key=verified_key,
+        #     wallpaper_image_key=wallpaper_key
+        # )
+
+        return new_image
+
+    @staticmethod
+    async def run_batch(
+        db: AsyncSession,
+        user_id: int,
+        items: List[Tuple[Dict[str, Any], str]]
+    ) -> List[BatchResult]:
+        """Generate one image per (customization, ai_model) item.
+
+        Items with the same prompt and model share multi-image provider
+        requests (up to the model's ``max_images_per_request``); every image is
+        composed concurrently and all rows are inserted in one transaction.
+        Returns, in item order, the persisted Image or the exception that item
+        failed with.
+        """
+        generator = get_image_generator()
+        results: List[Optional[BatchResult]] = [None] * len(items)
+
+        # Group identical prompts per model, then split each group into provider requests
+        groups: Dict[Tuple[str, str], List[int]] = {}
+        for index, (customization, ai_model) in enumerate(items):
+            prompt = generator.get_prompt_for_record(customization)
+            groups.setdefault((prompt, ai_model), []).append(index)
+        chunks = []
+        for (_, ai_model), indexes in groups.items():
+            per_request = max(1, AI_MODELS.get(ai_model, {}).get("max_images_per_request", 1))
+            for start in range(0, len(indexes), per_request):
+                chunks.append((ai_model, indexes[start:start + per_request]))
+
+        provider_limit = asyncio.Semaphore(BATCH_PROVIDER_CONCURRENCY)
+
+        async def run_chunk(ai_model: str, indexes: List[int]):
+            customization = items[indexes[0]][0]
+            try:
+                async with provider_limit, generation_admission.slot(wait=True):
+                    with generation_stage_seconds.time(stage="provider", model=ai_model):
+                        images = await provider_router.generate_many(customization, ai_model, len(indexes))
+                    outcomes = await asyncio.gather(*(
+                        GenerationPipeline._compose_and_store(image, ai_model) for image in images
+                    ), return_exceptions=True)
+                missing = len(indexes) - len(outcomes)
+                if missing > 0:
+                    outcomes += [RuntimeError(f"Provider returned {len(images)} of {len(indexes)} images")] * missing
+            except Exception as e:
+                outcomes = [e] * len(indexes)
+            for index, outcome in zip(indexes, outcomes):
+                results[index] = outcome
+
+        await asyncio.gather(*(run_chunk(ai_model, indexes) for ai_model, indexes in chunks))
+
+        # One transaction for every row that made it this far
+        rows = []
+        originals = []
+        for index, outcome in enumerate(results):
+            if isinstance(outcome, Exception):
+                continue
+            serial, verified_key, wallpaper_key, images = outcome
+            originals.append(images)
+            customization = items[index][0]
+            results[index] = GenerationPipeline._build_record(
+                user_id, serial, verified_key, wallpaper_key,
+                generator.get_prompt_for_record(customization), customization
+            )
+            rows.append(results[index])
+        if rows:
+            db.add_all(rows)
+            try:
+                with generation_stage_seconds.time(stage="db_commit", model="batch"):
+                    await db.commit()
+            except Exception as e:
+                await db.rollback()
+                # Every file was created exclusively for these rows
+                await GenerationPipeline._discard_images(rows)
+                results = [e if isinstance(result, Image) else result for result in results]
+            else:
+                for row, images in zip(rows, originals):
+                    verification_service.record_serial(row.serial)
+                    derivative_service.schedule_pregeneration(row.serial, images)
+        return results
+
+    @staticmethod
+    async def _compose_and_store(
+        base_image_bytes: bytes,
+        ai_model: str
+    ) -> Tuple[str, str, str, Dict[str, bytes]]:
+        """Compose and save both versions of one provider image under a fresh serial.
+
+        Returns (serial, verified_key, wallpaper_key, {variant: bytes}). A serial whose files
+        already exist is never overwritten; another serial is tried instead.
+        """
+        for attempt in range(SERIAL_COLLISION_RETRIES + 1):
+            serial = SerialGenerator.generate()
+            render_started = time.perf_counter()
+            verified_image_bytes, wallpaper_image_bytes, timings = await compute_pool.run(
+                render_generation_images, base_image_bytes, build_verification_url(serial), serial
+            )
+            timings["render"] = time.perf_counter() - render_started
+            observe_stages(timings, ai_model)
+            try:
+                verified_key, wallpaper_key = await GenerationPipeline._store_images(
+                    serial, verified_image_bytes, wallpaper_image_bytes, ai_model
+                )
+            except FileExistsError:
+                if attempt == SERIAL_COLLISION_RETRIES:
+                    raise
+                print(f"Warning: files for serial {serial} already exist, recomposing with a new serial")
+                continue
+            originals = {"verified": verified_image_bytes, "wallpaper": wallpaper_image_bytes}
+            return serial, verified_key, wallpaper_key, originals
+
+    @staticmethod
+    async def _store_images(
+        serial: str,
+        verified_image_bytes: bytes,
+        wallpaper_image_bytes: bytes,
+        ai_model: str
+    ) -> Tuple[str, str]:
+        """Save both versions through the configured storage backend.
+
+        Keys are created exclusively: if either already exists (another image
+        holds this serial) nothing is overwritten, whatever was written here is
+        removed again and FileExistsError is raised.
+        """
+        storage = get_storage()
+        verified_key = f"{serial}_verified.jpg"
+        wallpaper_key = f"{serial}_wallpaper.jpg"
+        with generation_stage_seconds.time(stage="storage_write", model=ai_model):
+            outcomes = await asyncio.gather(
+                storage.save(verified_key, verified_image_bytes, overwrite=False),
+                storage.save(wallpaper_key, wallpaper_image_bytes, overwrite=False),
+                return_exceptions=True
+            )
+        errors = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+        if errors:
+            for key, outcome in zip((verified_key, wallpaper_key), outcomes):
+                if not isinstance(outcome, BaseException):
+                    await GenerationPipeline._discard_keys([key])
+            raise errors[0]
+        return verified_key, wallpaper_key
+
+    @staticmethod
+    async def _discard_images(rows: List[Image]):
+        """Remove the stored files of rows that were never committed."""
+        await GenerationPipeline._discard_keys([
+            key for row in rows for key in (row.image_path_verified, row.image_path_wallpaper)
+        ])
+
+    @staticmethod
+    async def _discard_keys(keys: List[str]):
+        storage = get_storage()
+        for key in keys:
+            try:
+                await storage.delete(key)
+            except Exception as e:
+                print(f"Warning: could not remove {key}: {e}")
+
+    @staticmethod
+    def _build_record(
+        user_id: int,
+        serial: str,
+        verified_key: str,
+        wallpaper_key: str,
+        prompt: str,
+        customization: Dict[str, Any]
+    ) -> Image:
+        return Image(
+            user_id=user_id,
+            serial=serial,
+            # The time embedded in the serial, so signed verification (which
+            # reads it from the serial) reports the same creation time
+            created_at=SerialGenerator.parse_timestamp(serial),
+            image_path_verified=verified_key,
+            image_path_wallpaper=wallpaper_key,
+            prompt=prompt,
+            customization=json.dumps(customization),
+            payment_status="pending"  # Will be updated after payment
+        )
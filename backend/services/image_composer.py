@@ -1,8 +1,93 @@
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageChops, ImageFont
 from io import BytesIO
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
 import os
+import time
+
+from services.qr_generator import QR_OVERLAY_SIZE
+
+JPEG_QUALITY = 95
+SERIAL_FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+SERIAL_FONT_SIZE = 16
+
+@lru_cache(maxsize=1)
+def serial_font() -> ImageFont.ImageFont:
+    """The serial caption font, loaded once per process."""
+    try:
+        return ImageFont.truetype(SERIAL_FONT_PATH, SERIAL_FONT_SIZE)
+    except OSError:
+        return ImageFont.load_default()
+
+@lru_cache(maxsize=256)
+def _glyph(char: str) -> Tuple[Optional[Image.Image], Tuple[int, int], float]:
+    """Rasterized mask, baseline offset and advance of one caption character."""
+    font = serial_font()
+    mask, offset = font.getmask2(char, "L", anchor="ls")
+    image = Image.frombytes("L", mask.size, bytes(mask)) if mask.size[0] and mask.size[1] else None
+    return image, offset, font.getlength(char)
+
+def text_mask(text: str) -> Image.Image:
+    """Coverage mask of ``text`` built from cached glyphs, top-aligned like ``ImageDraw.text``."""
+    ascent, descent = serial_font().getmetrics()
+    mask = Image.new("L", (int(sum(_glyph(char)[2] for char in text)) + 4, ascent + descent))
+    x = 0.0
+    for char in text:
+        glyph, (dx, dy), advance = _glyph(char)
+        if glyph is not None:
+            box = (round(x) + dx, ascent + dy)
+            # Anti-aliased edges of neighbouring glyphs can overlap; keep the max coverage
+            region = mask.crop((*box, box[0] + glyph.width, box[1] + glyph.height))
+            mask.paste(ImageChops.lighter(region, glyph), box)
+        x += advance
+    return mask
 
 class ImageComposer:
+    # Variant name -> renderer; add new variants here
+    VARIANTS = {
+        "verified": "_render_verified",
+        "wallpaper": "_render_wallpaper",
+    }
+
+    @staticmethod
+    def compose_variants(
+        base_image_bytes: bytes,
+        variants: Iterable[str] = ("verified", "wallpaper"),
+        qr_image: Optional[Image.Image] = None,
+        serial: Optional[str] = None,
+        timings: Optional[Dict[str, float]] = None
+    ) -> Dict[str, bytes]:
+        """Decode the base image once and render every requested variant from it.
+
+        If ``timings`` is given, per-stage durations in seconds are added to it.
+        """
+        started = time.perf_counter()
+        source = Image.open(BytesIO(base_image_bytes))
+        source_format = source.format
+
+        # Single shared RGB pixel buffer for all variants
+        base_image = source if source.mode == "RGB" else source.convert("RGB")
+        base_image.load()
+        if timings is not None:
+            timings["decode"] = time.perf_counter() - started
+
+        results = {}
+        for variant in variants:
+            started = time.perf_counter()
+            renderer = ImageComposer.VARIANTS.get(variant)
+            if renderer is None:
+                raise ValueError(f"Unknown image variant: {variant}")
+            results[variant] = getattr(ImageComposer, renderer)(
+                base_image,
+                base_image_bytes=base_image_bytes,
+                source_format=source_format,
+                qr_image=qr_image,
+                serial=serial
+            )
+            if timings is not None:
+                timings[f"compose_{variant}"] = time.perf_counter() - started
+        return results
+
     @staticmethod
     def create_verified_image(
         base_image_bytes: bytes,
@@ -10,77 +95,67 @@ class ImageComposer:
         serial: str
     ) -> bytes:
         """Create an image with QR code and serial number (for verification)."""
-        # Open the base image
-        base_image = Image.open(BytesIO(base_image_bytes)).convert("RGBA")
-        
-        # Resize QR code to appropriate size (150x150)
-        qr_size = 150
-        qr_resized = qr_image.resize((qr_size, qr_size)).convert("RGBA")
-        
-        # Position QR in bottom-left corner with margin
-        margin = 20
-        qr_position = (margin, base_image.height - qr_size - margin)
-        
-        # Paste QR code on base image
-        base_image.paste(qr_resized, qr_position, qr_resized)
-        
-        # Add serial number text below QR code
-        draw = ImageDraw.Draw(base_image)
-        
-        # Try to use a better font, fallback to default
-        try:
-            font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 16)
-        except:
-            font = ImageFont.load_default()
-        
-        serial_text = f"Serial: {serial}"
-        
-        # Get text size using textbbox
-        bbox = draw.textbbox((0, 0), serial_text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        
-        # Position text below QR code
-        text_position = (margin, base_image.height - margin + 5)
-        
-        # Draw text with shadow for better visibility
-        shadow_offset = 2
-        draw.text(
-            (text_position[0] + shadow_offset, text_position[1] + shadow_offset),
-            serial_text,
-            font=font,
-            fill="black"
-        )
-        draw.text(
-            text_position,
-            serial_text,
-            font=font,
-            fill="white"
-        )
-        
-        # Convert back to RGB for saving as JPEG (smaller file size)
-        final_image = base_image.convert("RGB")
-        
-        # Save to bytes
-        output = BytesIO()
-        final_image.save(output, format="JPEG", quality=95)
-        output.seek(0)
-        
-        return output.getvalue()
-    
+        return ImageComposer.compose_variants(
+            base_image_bytes, ("verified",), qr_image=qr_image, serial=serial
+        )["verified"]
+
     @staticmethod
     def create_wallpaper_image(base_image_bytes: bytes) -> bytes:
         """Create a clean wallpaper image without QR/serial (for actual use)."""
-        # Open the base image
-        base_image = Image.open(BytesIO(base_image_bytes))
-        
-        # Convert to RGB if needed
-        if base_image.mode == "RGBA":
-            base_image = base_image.convert("RGB")
-        
-        # Save to bytes
+        return ImageComposer.compose_variants(base_image_bytes, ("wallpaper",))["wallpaper"]
+
+    @staticmethod
+    def _encode_jpeg(image: Image.Image) -> bytes:
         output = BytesIO()
-        base_image.save(output, format="JPEG", quality=95)
-        output.seek(0)
-        
+        image.save(output, format="JPEG", quality=JPEG_QUALITY)
         return output.getvalue()
+
+    @staticmethod
+    def _render_verified(
+        base_image: Image.Image,
+        qr_image: Optional[Image.Image] = None,
+        serial: Optional[str] = None,
+        **_
+    ) -> bytes:
+        if qr_image is None or serial is None:
+            raise ValueError("The verified variant needs a QR image and a serial")
+
+        # Draw on a copy so the shared base stays clean for other variants
+        canvas = base_image.copy()
+
+        # QRGenerator renders at overlay size already; only resample other sizes
+        qr_size = QR_OVERLAY_SIZE
+        if qr_image.size != (qr_size, qr_size):
+            qr_image = qr_image.resize((qr_size, qr_size), Image.NEAREST)
+
+        # Position QR in bottom-left corner with margin
+        margin = 20
+        qr_position = (margin, canvas.height - qr_size - margin)
+
+        # Paste QR code on base image (the QR is fully opaque, no mask needed)
+        canvas.paste(qr_image, qr_position)
+
+        # Add serial number text below QR code, shadow first for visibility
+        mask = text_mask(f"Serial: {serial}")
+        text_position = (margin, canvas.height - margin + 5)
+        shadow_offset = 2
+        for color, (x, y) in (
+            ((0, 0, 0), (text_position[0] + shadow_offset, text_position[1] + shadow_offset)),
+            ((255, 255, 255), text_position),
+        ):
+            canvas.paste(color, (x, y, x + mask.width, y + mask.height), mask)
+
+        return ImageComposer._encode_jpeg(canvas)
+
+    @staticmethod
+    def _render_wallpaper(
+        base_image: Image.Image,
+        base_image_bytes: bytes = b"",
+        source_format: Optional[str] = None,
+        **_
+    ) -> bytes:
+        # Provider already returned an RGB JPEG: serve it as-is, no re-encode
+        if source_format == "JPEG" and base_image.mode == "RGB" and base_image_bytes:
+            return base_image_bytes
+
+        return ImageComposer._encode_jpeg(base_image)
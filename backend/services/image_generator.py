@@ -1,11 +1,24 @@
 import os
+import base64
 import asyncio
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+import httpx
 import openai
-import requests
-from io import BytesIO
 import google.generativeai as genai
 
+from services.ai_models_config import get_model_config
+from services.generation_cache import generation_cache
+from services.metrics import generation_stage_seconds
+
+# Shared provider HTTP settings
+PROVIDER_TIMEOUT_SECONDS = float(os.getenv("PROVIDER_TIMEOUT_SECONDS", "120"))
+PROVIDER_CONNECT_TIMEOUT_SECONDS = float(os.getenv("PROVIDER_CONNECT_TIMEOUT_SECONDS", "10"))
+PROVIDER_MAX_RETRIES = int(os.getenv("PROVIDER_MAX_RETRIES", "2"))
+PROVIDER_MAX_CONNECTIONS = int(os.getenv("PROVIDER_MAX_CONNECTIONS", "20"))
+PROVIDER_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("PROVIDER_MAX_KEEPALIVE_CONNECTIONS", "10"))
+# "b64_json" returns the image inline; "url" needs a second download
+PROVIDER_RESPONSE_FORMAT = os.getenv("PROVIDER_RESPONSE_FORMAT", "b64_json")
+
 class ImageGeneratorService:
     def __init__(self):
         # Google Gemini setup
@@ -20,14 +33,39 @@ class ImageGeneratorService:
         else:
             self.gemini_configured = False
         
+        # Shared keep-alive connection pool for provider calls and downloads
+        self.http_client = openai.DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=PROVIDER_MAX_CONNECTIONS,
+                max_keepalive_connections=PROVIDER_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(
+                PROVIDER_TIMEOUT_SECONDS,
+                connect=PROVIDER_CONNECT_TIMEOUT_SECONDS
+            ),
+        )
+        
         # OpenAI setup
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         if self.openai_api_key and self.openai_api_key != "your-openai-api-key-here":
-            openai.api_key = self.openai_api_key
+            self.openai_client = openai.AsyncOpenAI(
+                api_key=self.openai_api_key,
+                base_url=os.getenv("OPENAI_BASE_URL") or None,
+                max_retries=PROVIDER_MAX_RETRIES,  # exponential backoff is built in
+                timeout=PROVIDER_TIMEOUT_SECONDS,
+                http_client=self.http_client,
+            )
             self.openai_configured = True
         else:
+            self.openai_client = None
             self.openai_configured = False
     
+    async def aclose(self):
+        """Close the shared HTTP connection pool."""
+        if self.openai_client is not None:
+            await self.openai_client.close()
+        await self.http_client.aclose()
+    
     def build_prompt(self, customization: Dict[str, Any]) -> str:
         """Build a detailed prompt based on user customization."""
         style = customization.get("style", "elegant")
@@ -81,10 +119,17 @@ Make it look like modern wealth in 2025 - think exclusive nightlife, private jet
     async def generate_image(
         self,
         customization: Dict[str, Any],
-        model: str = "gemini"
+        model: str = "gemini",
+        timeout: Optional[float] = None,
+        use_cache: bool = True
     ) -> bytes:
-        """Generate an image using the specified AI model."""
-        prompt = self.build_prompt(customization)
+        """Generate an image using the specified AI model.
+
+        ``use_cache=False`` always makes a provider request, neither reading
+        the generation cache nor joining an identical call already in flight.
+        """
+        with generation_stage_seconds.time(stage="prompt_build", model=model):
+            prompt = self.build_prompt(customization)
         
         if model == "gemini":
             if not self.gemini_configured:
@@ -101,42 +146,140 @@ Make it look like modern wealth in 2025 - think exclusive nightlife, private jet
             )
         
         elif model == "dalle":
-            if not self.openai_configured:
-                raise ValueError("OpenAI API key not configured. Please add OPENAI_API_KEY to .env file")
-            
-            # Generate image with DALL-E 3
-            response = openai.images.generate(
-                model="dall-e-3",
-                prompt=prompt,
-                size="1024x1792",  # Vertical format
-                quality="hd",
-                n=1,
+            # Generate image with DALL-E 3 (vertical default size)
+            return await self._generate_cached(
+                prompt, model,
+                lambda: self._generate_openai(prompt, model, timeout=timeout, quality="hd"),
+                use_cache
             )
-            
-            # Download the image
-            image_url = response.data[0].url
-            image_response = requests.get(image_url)
-            return image_response.content
         
         elif model == "dalle2":
-            if not self.openai_configured:
-                raise ValueError("OpenAI API key not configured. Please add OPENAI_API_KEY to .env file")
-            
-            # DALL-E 2 (cheaper, faster but lower quality)
-            response = openai.images.generate(
-                model="dall-e-2",
-                prompt=prompt,
-                size="1024x1024",  # DALL-E 2 only supports square
-                n=1,
+            # DALL-E 2 (cheaper, faster but lower quality, square only)
+            return await self._generate_cached(
+                prompt, model,
+                lambda: self._generate_openai(prompt, model, timeout=timeout),
+                use_cache
             )
-            
-            image_url = response.data[0].url
-            image_response = requests.get(image_url)
-            return image_response.content
         
         else:
             raise ValueError(f"Unsupported AI model: {model}. Available models: gemini, dalle, dalle2")
     
+    async def generate_images(
+        self,
+        customization: Dict[str, Any],
+        model: str,
+        count: int,
+        timeout: Optional[float] = None
+    ) -> List[bytes]:
+        """Generate ``count`` distinct images for one customization.
+
+        Uses as few provider requests as the model's ``max_images_per_request``
+        allows, issued concurrently. Bypasses the generation cache, which would
+        hand back the same image for every copy.
+        """
+        with generation_stage_seconds.time(stage="prompt_build", model=model):
+            prompt = self.build_prompt(customization)
+
+        if model == "dalle":
+            options = {"quality": "hd"}
+        elif model == "dalle2":
+            options = {}
+        else:
+            # gemini or unknown: same errors as the single-image path
+            return [await self.generate_image(customization, model=model, timeout=timeout)]
+
+        per_request = max(1, get_model_config(model).get("max_images_per_request", 1))
+        sizes = [min(per_request, count - start) for start in range(0, count, per_request)]
+        batches = await asyncio.gather(*(
+            self._generate_openai_many(prompt, model, n, timeout=timeout, **options) for n in sizes
+        ))
+        return [image for batch in batches for image in batch]
+
+    async def _generate_cached(self, prompt: str, model: str, generate, use_cache: bool = True) -> bytes:
+        """Serve from the generation cache when enabled, coalescing identical in-flight calls."""
+        if not use_cache:
+            return await generate()
+        size = get_model_config(model)["default_size"]
+        return await generation_cache.get_or_generate(prompt, model, size, generate)
+    
+    async def _generate_openai(
+        self,
+        prompt: str,
+        model: str,
+        timeout: Optional[float] = None,
+        **options
+    ) -> bytes:
+        """Call the OpenAI images API and return the raw image bytes."""
+        images = await self._generate_openai_many(prompt, model, 1, timeout=timeout, **options)
+        return images[0]
+    
+    async def _generate_openai_many(
+        self,
+        prompt: str,
+        model: str,
+        n: int,
+        timeout: Optional[float] = None,
+        **options
+    ) -> List[bytes]:
+        """Request ``n`` images in one OpenAI images API call."""
+        if not self.openai_configured:
+            raise ValueError("OpenAI API key not configured. Please add OPENAI_API_KEY to .env file")
+        
+        config = get_model_config(model)
+        with generation_stage_seconds.time(stage="provider_call", model=model):
+            response = await self.openai_client.images.generate(
+                model=config["model_id"],
+                prompt=prompt,
+                size=config["default_size"],
+                n=n,
+                response_format=PROVIDER_RESPONSE_FORMAT,
+                timeout=timeout or PROVIDER_TIMEOUT_SECONDS,
+                **options,
+            )
+        
+        if all(getattr(image, "b64_json", None) for image in response.data):
+            # Inline payload, no second round trip
+            return [base64.b64decode(image.b64_json) for image in response.data]
+        
+        # Download the images
+        with generation_stage_seconds.time(stage="image_download", model=model):
+            return list(await asyncio.gather(*(
+                self._download(image.url, timeout=timeout) for image in response.data
+            )))
+    
+    async def _download(self, url: str, timeout: Optional[float] = None) -> bytes:
+        """Download an image over the shared pool, retrying transient failures with backoff."""
+        delay = 0.5
+        for attempt in range(PROVIDER_MAX_RETRIES + 1):
+            try:
+                response = await self.http_client.get(url, timeout=timeout or PROVIDER_TIMEOUT_SECONDS)
+                if response.status_code < 500 and response.status_code != 429:
+                    response.raise_for_status()
+                    return response.content
+                if attempt == PROVIDER_MAX_RETRIES:
+                    response.raise_for_status()
+            except (httpx.TransportError, httpx.TimeoutException):
+                if attempt == PROVIDER_MAX_RETRIES:
+                    raise
+            await asyncio.sleep(delay)
+            delay *= 2
+    
     def get_prompt_for_record(self, customization: Dict[str, Any]) -> str:
         """Get the prompt that will be stored in database."""
         return self.build_prompt(customization)
+
+_generator: Optional[ImageGeneratorService] = None
+
+def get_image_generator() -> ImageGeneratorService:
+    """Return the process-wide ImageGeneratorService, creating it on first use."""
+    global _generator
+    if _generator is None:
+        _generator = ImageGeneratorService()
+    return _generator
+
+async def close_image_generator():
+    """Release the shared provider connection pool (called on shutdown)."""
+    global _generator
+    if _generator is not None:
+        await _generator.aclose()
+        _generator = None
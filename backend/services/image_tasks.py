@@ -0,0 +1,46 @@
+import time
+from io import BytesIO
+from typing import Dict, Tuple
+from PIL import Image
+
+from services.qr_generator import QRGenerator, QR_OVERLAY_SIZE
+from services.image_composer import ImageComposer
+
+def render_generation_images(
+    base_image_bytes: bytes,
+    verification_url: str,
+    serial: str
+) -> Tuple[bytes, bytes, Dict[str, float]]:
+    """Build the QR code and both image versions.
+
+    Returns (verified, wallpaper, stage timings in seconds). Kept as a plain
+    module-level function so it can be shipped to the compute process pool.
+    """
+    started = time.perf_counter()
+    qr_image = QRGenerator.generate(verification_url, QR_OVERLAY_SIZE)
+    timings = {"qr_generate": time.perf_counter() - started}
+
+    # One decode of the provider bytes shared by both versions:
+    # verified (with QR + serial) and wallpaper (clean, no QR/serial)
+    images = ImageComposer.compose_variants(
+        base_image_bytes, ("verified", "wallpaper"), qr_image=qr_image, serial=serial, timings=timings
+    )
+    return images["verified"], images["wallpaper"], timings
+
+def render_derivative(source_bytes: bytes, width: int, fmt: str, quality: int) -> bytes:
+    """Downscale a stored image to ``width`` pixels wide and re-encode it as ``fmt``."""
+    image = Image.open(BytesIO(source_bytes))
+    height = max(1, round(image.height * width / image.width))
+    if width < image.width:
+        # Let the JPEG decoder do most of the downscaling (DCT scaling)
+        image.draft("RGB", (width, height))
+        image = image.convert("RGB").resize((width, height), Image.LANCZOS)
+    else:
+        image = image.convert("RGB")
+
+    output = BytesIO()
+    if fmt == "webp":
+        image.save(output, format="WEBP", quality=quality, method=4)
+    else:
+        image.save(output, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return output.getvalue()
@@ -0,0 +1,83 @@
+import os
+import time
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+JOB_EVENTS_HISTORY = int(os.getenv("JOB_EVENTS_HISTORY", "20"))
+JOB_EVENTS_RETENTION_SECONDS = float(os.getenv("JOB_EVENTS_RETENTION_SECONDS", "300"))
+
+TERMINAL_EVENTS = ("completed", "failed")
+
+Event = Tuple[int, str, Dict[str, Any]]
+
+class _JobChannel:
+    def __init__(self):
+        self.history: List[Event] = []
+        self.subscribers: List[asyncio.Queue] = []
+        self.sequence = 0
+        self.closed_at: Optional[float] = None
+
+class JobEventBroker:
+    """In-process fan-out of generation job progress events.
+
+    Recent events are kept per job so a client that subscribes late (or
+    reconnects) first receives what it missed. Events only reach clients
+    connected to the worker that runs the job; the streaming endpoint falls
+    back to the database for the final state.
+    """
+
+    def __init__(self):
+        self._channels: Dict[str, _JobChannel] = {}
+
+    def publish(self, job_id: str, event: str, data: Optional[Dict[str, Any]] = None):
+        self._prune()
+        channel = self._channels.setdefault(job_id, _JobChannel())
+        channel.sequence += 1
+        item = (channel.sequence, event, data or {})
+        channel.history.append(item)
+        del channel.history[:-JOB_EVENTS_HISTORY]
+        for queue in channel.subscribers:
+            queue.put_nowait(item)
+        if event in TERMINAL_EVENTS:
+            channel.closed_at = time.monotonic()
+
+    async def subscribe(self, job_id: str, after: int = 0, timeout: Optional[float] = None) -> AsyncIterator[Optional[Event]]:
+        """Yield events for ``job_id`` newer than ``after``, ending after a terminal event.
+
+        Yields None whenever ``timeout`` seconds pass without an event.
+        """
+        channel = self._channels.setdefault(job_id, _JobChannel())
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in channel.history:
+            if item[0] > after:
+                queue.put_nowait(item)
+        channel.subscribers.append(queue)
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield item
+                if item[1] in TERMINAL_EVENTS:
+                    return
+        finally:
+            channel.subscribers.remove(queue)
+            if not channel.history and not channel.subscribers:
+                # Nothing was ever published here (e.g. the job runs in another worker)
+                self._channels.pop(job_id, None)
+
+    def _prune(self):
+        """Forget finished jobs once their retention period has passed."""
+        now = time.monotonic()
+        expired = [
+            job_id for job_id, channel in self._channels.items()
+            if channel.closed_at is not None
+            and not channel.subscribers
+            and now - channel.closed_at > JOB_EVENTS_RETENTION_SECONDS
+        ]
+        for job_id in expired:
+            del self._channels[job_id]
+
+job_events = JobEventBroker()
@@ -0,0 +1,252 @@
+import os
+import json
+import uuid
+import socket
+import asyncio
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal
+from models import GenerationJob
+from services.generation_pipeline import GenerationPipeline
+from services.job_events import job_events
+from services.rate_limiter import generation_admission
+
+# Delay before a job whose claim failed (e.g. the database was busy) is tried again
+CLAIM_RETRY_SECONDS = float(os.getenv("GENERATION_JOB_CLAIM_RETRY_SECONDS", "1"))
+
+class QueueFullError(Exception):
+    """Raised when the generation queue cannot accept more jobs."""
+
+class GenerationJobQueue:
+    """Bounded in-process worker pool for image generation jobs.
+
+    Jobs are persisted in the ``generation_jobs`` table. Several processes
+    may share it: a worker claims a job with a conditional update before
+    running it, and holds a lease on it that is renewed while the job runs.
+    Jobs whose lease expired (their process died) are queued again by the
+    next process to start or sweep.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        max_attempts: Optional[int] = None
+    ):
+        self.workers = workers or int(os.getenv("GENERATION_WORKERS", "4"))
+        self.max_pending = max_pending or int(os.getenv("GENERATION_QUEUE_SIZE", "100"))
+        self.max_attempts = max_attempts or int(os.getenv("GENERATION_JOB_MAX_ATTEMPTS", "3"))
+        self.lease_seconds = float(os.getenv("GENERATION_JOB_LEASE_SECONDS", "60"))
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def start(self):
+        """Recover unfinished jobs from the database and spawn the workers."""
+        # The recovered backlog may exceed max_pending, so the queue itself is
+        # unbounded and the limit is enforced in submit()
+        self._queue = asyncio.Queue()
+
+        async with AsyncSessionLocal() as db:
+            await self._requeue_expired(db)
+            # Queued jobs may also sit in a live sibling's queue; the claim in
+            # _process makes sure only one of us runs each
+            result = await db.execute(
+                select(GenerationJob).where(
+                    GenerationJob.status == "queued"
+                ).order_by(GenerationJob.created_at)
+            )
+            for job in result.scalars():
+                self._queue.put_nowait(job.id)
+                job_events.publish(job.id, "queued", {"attempts": job.attempts or 0})
+
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"generation-worker-{i}")
+            for i in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._sweeper(), name="generation-lease-sweeper"))
+
+    async def stop(self):
+        """Cancel the workers and hand their in-flight jobs back to the queue."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(GenerationJob).where(
+                    GenerationJob.status == "running",
+                    GenerationJob.lease_owner == self.owner
+                ).values(status="queued", lease_owner=None, lease_expires=None)
+            )
+            await db.commit()
+
+    async def _requeue_expired(self, db: AsyncSession) -> List[str]:
+        """Move running jobs whose lease has expired back to 'queued'; returns their ids."""
+        now = datetime.utcnow()
+        expired = (await db.execute(
+            select(GenerationJob.id).where(
+                GenerationJob.status == "running",
+                or_(GenerationJob.lease_expires.is_(None), GenerationJob.lease_expires < now)
+            )
+        )).scalars().all()
+        requeued = []
+        for job_id in expired:
+            # Conditional, so a job whose lease was just renewed is left alone
+            result = await db.execute(
+                update(GenerationJob).where(
+                    GenerationJob.id == job_id,
+                    GenerationJob.status == "running",
+                    or_(GenerationJob.lease_expires.is_(None), GenerationJob.lease_expires < now)
+                ).values(status="queued", lease_owner=None, lease_expires=None)
+            )
+            if result.rowcount == 1:
+                requeued.append(job_id)
+        await db.commit()
+        return requeued
+
+    async def _sweeper(self):
+        """Periodically pick up jobs abandoned by processes that died."""
+        while True:
+            await asyncio.sleep(self.lease_seconds)
+            try:
+                async with AsyncSessionLocal() as db:
+                    for job_id in await self._requeue_expired(db):
+                        self._queue.put_nowait(job_id)
+                        job_events.publish(job_id, "queued", {"recovered": True})
+            except Exception as e:
+                print(f"Warning: generation job lease sweep failed: {e}")
+
+    async def _renew_lease(self, job_id: str):
+        """Extend this worker's lease on a running job until cancelled."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(
+                        update(GenerationJob).where(
+                            GenerationJob.id == job_id,
+                            GenerationJob.lease_owner == self.owner
+                        ).values(lease_expires=datetime.utcnow() + timedelta(seconds=self.lease_seconds))
+                    )
+                    await db.commit()
+            except Exception as e:
+                print(f"Warning: could not renew the lease on generation job {job_id}: {e}")
+
+    async def submit(self, db: AsyncSession, user_id: int, payload: dict) -> GenerationJob:
+        """Persist a new job and schedule it for the worker pool."""
+        if self._queue is None:
+            raise RuntimeError("Generation job queue is not running")
+        if self._queue.qsize() >= self.max_pending:
+            raise QueueFullError("Generation queue is full, please retry later")
+
+        job = GenerationJob(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            status="queued",
+            request=json.dumps(payload),
+            attempts=0,
+            created_at=datetime.utcnow(),
+            image=None
+        )
+        db.add(job)
+        await db.commit()
+
+        self._queue.put_nowait(job.id)
+        job_events.publish(job.id, "queued", {"attempts": 0})
+        return job
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._process(job_id)
+            except Exception as e:
+                print(f"Warning: generation job {job_id} crashed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _claim(self, db: AsyncSession, job_id: str) -> Optional[GenerationJob]:
+        """Atomically take a queued job; returns it, or None if another worker got there first."""
+        now = datetime.utcnow()
+        claim = await db.execute(
+            update(GenerationJob).where(
+                GenerationJob.id == job_id,
+                GenerationJob.status == "queued"
+            ).values(
+                status="running",
+                attempts=GenerationJob.attempts + 1,
+                started_at=now,
+                lease_owner=self.owner,
+                lease_expires=now + timedelta(seconds=self.lease_seconds)
+            )
+        )
+        job = await db.get(GenerationJob, job_id) if claim.rowcount == 1 else None
+        # Ends the transaction: with a single SQLite writer connection, holding it
+        # through the pipeline would block every other write until the job finishes
+        await db.commit()
+        return job
+
+    async def _process(self, job_id: str):
+        async with AsyncSessionLocal() as db:
+            try:
+                job = await self._claim(db, job_id)
+            except Exception as e:
+                # Still 'queued' in the database; try again rather than strand it
+                print(f"Warning: could not claim generation job {job_id}, retrying: {e}")
+                asyncio.get_running_loop().call_later(CLAIM_RETRY_SECONDS, self._queue.put_nowait, job_id)
+                return
+            if job is None:
+                return
+
+            if job.attempts > self.max_attempts:
+                job.status = "failed"
+                job.error = job.error or "Maximum attempts exceeded"
+                job.completed_at = datetime.utcnow()
+                job.lease_expires = None
+                await db.commit()
+                job_events.publish(job.id, "failed", {"error": job.error})
+                return
+
+            job_events.publish(job.id, "running", {"attempts": job.attempts})
+
+            payload = json.loads(job.request)
+            lease = asyncio.create_task(self._renew_lease(job_id))
+            try:
+                # Queued jobs wait for a slot instead of being rejected
+                async with generation_admission.slot(wait=True):
+                    image = await GenerationPipeline.run(
+                        db,
+                        user_id=job.user_id,
+                        customization=payload["customization"],
+                        ai_model=payload["ai_model"],
+                        progress=lambda event, data: job_events.publish(job_id, event, data)
+                    )
+            except Exception as e:
+                await db.rollback()
+                job.status = "failed"
+                job.error = f"Error generating image: {str(e)}"
+            else:
+                job.status = "completed"
+                job.image_id = image.id
+                job.error = None
+            finally:
+                lease.cancel()
+            job.completed_at = datetime.utcnow()
+            job.lease_expires = None
+            await db.commit()
+            if job.status == "completed":
+                job_events.publish(job.id, "completed", {"image_id": job.image_id})
+            else:
+                job_events.publish(job.id, "failed", {"error": job.error})
+
+job_queue = GenerationJobQueue()
@@ -0,0 +1,276 @@
+import os
+import time
+import asyncio
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("LOOP_LAG_INTERVAL_SECONDS", "0.5"))
+
+# Seconds; covers sub-millisecond work up to slow provider calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+LabelValues = Tuple[str, ...]
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts..., +Inf count], sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+        lines = self.header()
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="{}"'.format(_format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+class GaugeFunction(Metric):
+    """Gauge whose samples are read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]],
+        labelnames: Sequence[str] = ()
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        try:
+            samples = list(self.collect())
+        except Exception as e:
+            print(f"Warning: metric {self.name} collection failed: {e}")
+            samples = []
+        for labels, value in samples:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, self._key(labels))} {_format_value(value)}")
+        return lines
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text exposition format.
+
+    Recording is a dict update under a lock; all formatting happens only
+    when the endpoint is scraped.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, collect, labelnames: Sequence[str] = ()) -> GaugeFunction:
+        return self.register(GaugeFunction(name, documentation, collect, labelnames))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+# Shared metrics recorded across the services
+generation_stage_seconds = registry.histogram(
+    "imrich_generation_stage_seconds",
+    "Time spent in each image generation stage",
+    ("stage", "model")
+)
+http_requests_total = registry.counter(
+    "imrich_http_requests_total",
+    "HTTP requests by route and status code",
+    ("method", "route", "status")
+)
+http_request_duration_seconds = registry.histogram(
+    "imrich_http_request_duration_seconds",
+    "HTTP request latency until response headers are sent",
+    ("method", "route")
+)
+provider_errors_total = registry.counter(
+    "imrich_provider_errors_total",
+    "Failed image provider calls by model and error type",
+    ("model", "error")
+)
+event_loop_lag_seconds = registry.histogram(
+    "imrich_event_loop_lag_seconds",
+    "Delay between when the loop monitor should wake and when it did",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+
+def observe_stages(timings: Dict[str, float], model: str):
+    """Record stage durations measured elsewhere (e.g. in the compute pool)."""
+    for stage, seconds in timings.items():
+        generation_stage_seconds.observe(seconds, stage=stage, model=model)
+
+def _route_label(scope) -> str:
+    # Route templates keep the label set bounded (no raw ids in paths)
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests and timing them per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+        observed = False
+
+        async def send_wrapper(message):
+            nonlocal status_code, observed
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                observed = True
+                http_request_duration_seconds.observe(
+                    time.perf_counter() - started, method=scope["method"], route=_route_label(scope)
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = _route_label(scope)
+            if not observed:
+                http_request_duration_seconds.observe(
+                    time.perf_counter() - started, method=scope["method"], route=route
+                )
+            http_requests_total.inc(method=scope["method"], route=route, status=str(status_code))
+
+class LoopLagMonitor:
+    """Samples event-loop responsiveness by timing a periodic sleep."""
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL_SECONDS):
+        self.interval = interval
+        self.last_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if METRICS_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(loop.time() - expected, 0.0)
+            event_loop_lag_seconds.observe(self.last_lag)
+
+loop_lag_monitor = LoopLagMonitor()
+registry.gauge(
+    "imrich_event_loop_lag_last_seconds",
+    "Most recent event loop lag sample",
+    lambda: [({}, loop_lag_monitor.last_lag)]
+)
@@ -0,0 +1,286 @@
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from services.ai_models_config import AI_MODELS
+from services.generation_cache import track_cache_usage
+from services.image_generator import ImageGeneratorService, get_image_generator
+from services.metrics import provider_errors_total
+
+# Whole-request budget shared by every attempt, fallback and hedge
+GENERATION_DEADLINE_SECONDS = float(os.getenv("GENERATION_DEADLINE_SECONDS", "150"))
+PROVIDER_STATS_WINDOW = int(os.getenv("PROVIDER_STATS_WINDOW", "100"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_ERROR_RATE = float(os.getenv("CIRCUIT_ERROR_RATE", "0.5"))
+CIRCUIT_MIN_SAMPLES = int(os.getenv("CIRCUIT_MIN_SAMPLES", "10"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+# Hedging sends a duplicate (billed) request, so it is off by default
+PROVIDER_HEDGE_ENABLED = os.getenv("PROVIDER_HEDGE_ENABLED", "false").lower() == "true"
+PROVIDER_HEDGE_PERCENTILE = float(os.getenv("PROVIDER_HEDGE_PERCENTILE", "0.95"))
+PROVIDER_HEDGE_MIN_SAMPLES = int(os.getenv("PROVIDER_HEDGE_MIN_SAMPLES", "20"))
+
+class ProviderUnavailableError(Exception):
+    """Raised when no allowed model could produce an image within the deadline."""
+
+class ModelHealth:
+    """Rolling latency/error window and circuit breaker for one model.
+
+    The breaker opens after CIRCUIT_FAILURE_THRESHOLD consecutive failures
+    or when the windowed error rate exceeds CIRCUIT_ERROR_RATE. After
+    CIRCUIT_RESET_SECONDS a single trial request is let through (half-open);
+    its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, window: int = PROVIDER_STATS_WINDOW):
+        self.samples: Deque[Tuple[float, bool]] = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.requests = 0
+        self.failures = 0
+        self.hedges = 0
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= CIRCUIT_RESET_SECONDS:
+            self.state = "half_open"
+        if self.state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record(self, latency: float, ok: bool):
+        self.requests += 1
+        self.samples.append((latency, ok))
+        self.trial_in_flight = False
+        if ok:
+            self.consecutive_failures = 0
+            self.state = "closed"
+            return
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self._should_open():
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def _should_open(self) -> bool:
+        if self.consecutive_failures >= CIRCUIT_FAILURE_THRESHOLD:
+            return True
+        return len(self.samples) >= CIRCUIT_MIN_SAMPLES and self.error_rate > CIRCUIT_ERROR_RATE
+
+    @property
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        latencies = sorted(latency for latency, ok in self.samples if ok)
+        if not latencies:
+            return None
+        index = min(int(percentile * len(latencies)), len(latencies) - 1)
+        return latencies[index]
+
+    def stats(self) -> Dict[str, Any]:
+        p50 = self.latency_percentile(0.5)
+        p95 = self.latency_percentile(0.95)
+        return {
+            "state": self.state,
+            "requests": self.requests,
+            "failures": self.failures,
+            "hedges": self.hedges,
+            "error_rate": round(self.error_rate, 4),
+            "latency_p50": round(p50, 3) if p50 is not None else None,
+            "latency_p95": round(p95, 3) if p95 is not None else None,
+        }
+
+class ProviderRouter:
+    """Routes generation requests across the models in AI_MODELS.
+
+    The requested model is tried first, then its configured ``fallbacks``,
+    skipping any whose circuit breaker is open. With hedging enabled, a
+    second request to the same model is started once the first has run
+    longer than the model's latency percentile; whichever finishes first wins.
+    """
+
+    def __init__(self, generator: Optional[ImageGeneratorService] = None):
+        self._generator = generator
+        self.health: Dict[str, ModelHealth] = {}
+        self.failovers = 0
+
+    @property
+    def generator(self) -> ImageGeneratorService:
+        return self._generator or get_image_generator()
+
+    def _health(self, model: str) -> ModelHealth:
+        if model not in AI_MODELS:
+            # Unconfigured names (gemini, or anything a caller sends) fail before
+            # reaching a provider; a throwaway entry keeps them out of stats and metrics
+            return ModelHealth()
+        if model not in self.health:
+            self.health[model] = ModelHealth()
+        return self.health[model]
+
+    @staticmethod
+    def candidates(model: str) -> List[str]:
+        """The requested model followed by its allowed alternates."""
+        config = AI_MODELS.get(model, {})
+        models = [model]
+        for fallback in config.get("fallbacks", []):
+            if fallback in AI_MODELS and fallback not in models:
+                models.append(fallback)
+        return models
+
+    async def generate(
+        self,
+        customization: Dict[str, Any],
+        model: str,
+        deadline: Optional[float] = None
+    ) -> bytes:
+        """Generate an image for ``model`` or one of its fallbacks within the deadline."""
+        return await self._route(
+            model, deadline,
+            lambda candidate, health, remaining: self._attempt(candidate, customization, health, remaining)
+        )
+
+    async def generate_many(
+        self,
+        customization: Dict[str, Any],
+        model: str,
+        count: int,
+        deadline: Optional[float] = None
+    ) -> List[bytes]:
+        """Generate ``count`` images with one routed multi-image request.
+
+        Fails over like ``generate`` but never hedges, since a duplicate
+        request would bill every image twice.
+        """
+        return await self._route(
+            model, deadline,
+            lambda candidate, health, remaining: self._call(
+                candidate, health, remaining,
+                lambda: self.generator.generate_images(customization, candidate, count, timeout=remaining)
+            )
+        )
+
+    async def _route(
+        self,
+        model: str,
+        deadline: Optional[float],
+        attempt: Callable[[str, ModelHealth, float], Awaitable[Any]]
+    ) -> Any:
+        """Run ``attempt`` against each allowed candidate model until one succeeds."""
+        loop = asyncio.get_running_loop()
+        deadline_at = loop.time() + (deadline or GENERATION_DEADLINE_SECONDS)
+        last_error: Optional[Exception] = None
+
+        for index, candidate in enumerate(self.candidates(model)):
+            remaining = deadline_at - loop.time()
+            if remaining <= 0:
+                break
+            health = self._health(candidate)
+            if not health.allow():
+                last_error = ProviderUnavailableError(f"{candidate} circuit is open")
+                continue
+            if index > 0:
+                self.failovers += 1
+            try:
+                return await attempt(candidate, health, remaining)
+            except Exception as e:
+                # Includes not-configured models (ValueError): move on to the next one
+                last_error = e
+
+        if last_error is None:
+            raise ProviderUnavailableError("Generation deadline exceeded")
+        if isinstance(last_error, (ValueError, NotImplementedError)) and len(self.candidates(model)) == 1:
+            raise last_error
+        raise ProviderUnavailableError(f"No image provider available: {last_error}") from last_error
+
+    async def _attempt(
+        self,
+        model: str,
+        customization: Dict[str, Any],
+        health: ModelHealth,
+        budget: float
+    ) -> bytes:
+        hedge_after = None
+        if PROVIDER_HEDGE_ENABLED and len(health.samples) >= PROVIDER_HEDGE_MIN_SAMPLES:
+            hedge_after = health.latency_percentile(PROVIDER_HEDGE_PERCENTILE)
+
+        loop = asyncio.get_running_loop()
+        deadline_at = loop.time() + budget
+        request = lambda: self.generator.generate_image(customization, model=model, timeout=budget)
+        # The hedge must reach the provider: through the cache it would just
+        # join the in-flight call it is meant to race
+        hedge = lambda: self.generator.generate_image(
+            customization, model=model, timeout=deadline_at - loop.time(), use_cache=False
+        )
+        tasks = {asyncio.ensure_future(self._call(model, health, budget, request))}
+        try:
+            if hedge_after is not None and hedge_after < budget:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+                if not done:
+                    health.hedges += 1
+                    tasks.add(asyncio.ensure_future(
+                        self._call(model, health, deadline_at - loop.time(), hedge)
+                    ))
+
+            last_error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(
+                    tasks,
+                    timeout=max(deadline_at - loop.time(), 0),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise asyncio.TimeoutError(f"{model} exceeded the generation deadline")
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _call(
+        self,
+        model: str,
+        health: ModelHealth,
+        budget: float,
+        request: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        started = time.monotonic()
+        with track_cache_usage() as usage:
+            try:
+                data = await asyncio.wait_for(request(), timeout=budget)
+            except (asyncio.CancelledError, ValueError, NotImplementedError):
+                # Lost a hedge race or misconfigured: says nothing about provider health
+                health.trial_in_flight = False
+                raise
+            except Exception as e:
+                if usage.served_from_cache:
+                    # Shared a failed in-flight call; its owner records the failure
+                    health.trial_in_flight = False
+                    raise
+                health.record(time.monotonic() - started, ok=False)
+                provider_errors_total.inc(model=model, error=type(e).__name__)
+                raise
+        if usage.served_from_cache:
+            # Near-zero cache latencies would drag the hedging percentile down
+            health.trial_in_flight = False
+        else:
+            health.record(time.monotonic() - started, ok=True)
+        return data
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "failovers": self.failovers,
+            "models": {model: health.stats() for model, health in self.health.items()},
+        }
+
+provider_router = ProviderRouter()
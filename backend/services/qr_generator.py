@@ -1,20 +1,117 @@
 import qrcode
+import numpy as np
 from io import BytesIO
+from functools import lru_cache
+from typing import Optional
 from PIL import Image
 
+# Edge length of the QR overlay on the verified image, in pixels
+QR_OVERLAY_SIZE = 150
+
+# 1:1:3:1:1 finder-like runs with four light modules on either side (ISO/IEC 18004)
+_FINDER_LIKE = np.array([
+    [1, 0, 1, 1, 1, 0, 1, 0, 0, 0, 0],
+    [0, 0, 0, 0, 1, 0, 1, 1, 1, 0, 1],
+], dtype=bool)
+
+@lru_cache(maxsize=8)
+def _mask_patterns(modules_count: int) -> np.ndarray:
+    """The eight standard data masks for a symbol size, stacked as (8, n, n)."""
+    i, j = np.indices((modules_count, modules_count))
+    return np.stack([
+        (i + j) % 2 == 0,
+        i % 2 == 0,
+        j % 3 == 0,
+        (i + j) % 3 == 0,
+        (i // 2 + j // 3) % 2 == 0,
+        (i * j) % 2 + (i * j) % 3 == 0,
+        ((i * j) % 2 + (i * j) % 3) % 2 == 0,
+        ((i * j) % 3 + (i + j) % 2) % 2 == 0,
+    ])
+
+def _penalties(candidates: np.ndarray) -> np.ndarray:
+    """Mask penalty scores for a (k, n, n) stack, matching ``qrcode.util.lost_point``."""
+    count, n, _ = candidates.shape
+    # Rows and columns of every candidate as one (k, 2n, n) stack of lines
+    lines = np.concatenate([candidates, candidates.transpose(0, 2, 1)], axis=1)
+
+    # Runs of five or more same-coloured modules score length - 2. A sentinel
+    # column keeps runs from continuing across line ends.
+    padded = np.full((count, 2 * n, n + 1), 2, dtype=np.int8)
+    padded[:, :, :n] = lines
+    flat = padded.ravel()
+    starts = np.concatenate(([0], np.flatnonzero(flat[1:] != flat[:-1]) + 1))
+    lengths = np.diff(np.append(starts, flat.size))
+    long_runs = lengths >= 5
+    runs = np.bincount(starts[long_runs] // padded[0].size, weights=lengths[long_runs] - 2, minlength=count)
+
+    # Each single-coloured 2x2 block scores 3
+    top_left = candidates[:, :-1, :-1]
+    blocks = (
+        (top_left == candidates[:, 1:, :-1])
+        & (top_left == candidates[:, :-1, 1:])
+        & (top_left == candidates[:, 1:, 1:])
+    ).sum(axis=(1, 2)) * 3
+
+    # Each finder-like pattern in a row or column scores 40
+    windows = np.lib.stride_tricks.sliding_window_view(lines, 11, axis=2)
+    finder = (windows[..., None, :] == _FINDER_LIKE).all(axis=-1).any(axis=-1).sum(axis=(1, 2)) * 40
+
+    # 10 per full 5% the dark proportion strays from 50%
+    dark = candidates.sum(axis=(1, 2)) / float(n * n)
+    balance = (np.abs(dark * 100 - 50) / 5).astype(int) * 10
+
+    return runs.astype(int) + blocks + finder + balance
+
+class _QRCode(qrcode.QRCode):
+    """QRCode that places the data once and scores all eight masks together.
+
+    ``qrcode`` rebuilds the whole symbol for every candidate mask and scores it
+    in pure Python; here the placed data is re-masked with array ops instead.
+    """
+
+    def map_data(self, data, mask_pattern):
+        # Modules still unset at this point are the data region
+        self.data_region = np.array([[module is None for module in row] for row in self.modules])
+        super().map_data(data, mask_pattern)
+
+    def best_mask_pattern(self):
+        self.makeImpl(True, 0)
+        masks = _mask_patterns(self.modules_count) & self.data_region
+        unmasked = np.array(self.modules, dtype=bool) ^ masks[0]
+        # First lowest score wins, as in qrcode
+        return int(np.argmin(_penalties(unmasked ^ masks)))
+
 class QRGenerator:
     @staticmethod
-    def generate(verification_url: str) -> Image.Image:
-        """Generate a QR code image from a verification URL."""
-        qr = qrcode.QRCode(
+    def matrix(verification_url: str) -> np.ndarray:
+        """Build the QR module matrix (True = dark module), including the quiet zone."""
+        qr = _QRCode(
             version=1,
             error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
             border=2,
         )
         qr.add_data(verification_url)
         qr.make(fit=True)
-        
-        # Create QR code image with white foreground and black background
-        qr_img = qr.make_image(fill_color="white", back_color="black")
-        return qr_img
+        return np.array(qr.get_matrix(), dtype=bool)
+
+    @staticmethod
+    def rasterize(modules: np.ndarray, size: int) -> Image.Image:
+        """Rasterize a module matrix straight to ``size`` x ``size`` as an "L" image.
+
+        Each output pixel takes the value of the module it falls in, so edges stay
+        crisp with no resampling; dark modules are white on a black background.
+        """
+        index = np.arange(size) * modules.shape[0] // size
+        pixels = np.where(modules[index[:, None], index[None, :]], 255, 0).astype(np.uint8)
+        return Image.fromarray(pixels)
+
+    @staticmethod
+    def generate(verification_url: str, size: Optional[int] = None) -> Image.Image:
+        """Generate a QR code image from a verification URL.
+
+        With ``size`` the code is rendered directly at that pixel size;
+        otherwise each module is 10 pixels.
+        """
+        modules = QRGenerator.matrix(verification_url)
+        return QRGenerator.rasterize(modules, size or modules.shape[0] * 10)
@@ -0,0 +1,283 @@
+import os
+import math
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Set, Tuple
+
+class RateLimitExceeded(Exception):
+    """Raised when a user has used up their generation budget."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Too many generation requests, please slow down")
+        self.retry_after = retry_after
+
+class CapacityExceeded(Exception):
+    """Raised when the process-wide generation concurrency cap is reached."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Image generation is at capacity, please retry later")
+        self.retry_after = retry_after
+
+class RateLimitStore:
+    """Where token buckets and concurrency slots are kept."""
+
+    async def take_token(self, key: str, capacity: float, rate: float, cost: float = 1.0) -> float:
+        """Take ``cost`` tokens from ``key``'s bucket; returns 0 or the seconds until they are available."""
+        raise NotImplementedError
+
+    async def acquire_slot(self, name: str, limit: int, lease_seconds: float) -> Optional[str]:
+        """Claim one of ``limit`` slots; returns a slot id, or None when all are taken."""
+        raise NotImplementedError
+
+    async def renew_slot(self, name: str, slot_id: str, lease_seconds: float):
+        """Extend a held slot's lease by ``lease_seconds`` from now."""
+        raise NotImplementedError
+
+    async def release_slot(self, name: str, slot_id: str):
+        raise NotImplementedError
+
+def _refill(tokens: float, updated: float, now: float, capacity: float, rate: float) -> float:
+    return min(capacity, tokens + max(now - updated, 0.0) * rate)
+
+class MemoryRateLimitStore(RateLimitStore):
+    """Per-process store; each worker enforces its own budget."""
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._slots: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    async def take_token(self, key: str, capacity: float, rate: float, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = _refill(tokens, updated, now, capacity, rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (cost - tokens) / rate
+
+    async def acquire_slot(self, name: str, limit: int, lease_seconds: float) -> Optional[str]:
+        with self._lock:
+            slots = self._slots.setdefault(name, set())
+            if len(slots) >= limit:
+                return None
+            slot_id = uuid.uuid4().hex
+            slots.add(slot_id)
+            return slot_id
+
+    async def renew_slot(self, name: str, slot_id: str, lease_seconds: float):
+        pass  # Slots here are held until released, never expired
+
+    async def release_slot(self, name: str, slot_id: str):
+        with self._lock:
+            self._slots.get(name, set()).discard(slot_id)
+
+class SQLiteRateLimitStore(RateLimitStore):
+    """Store in a local SQLite file shared by every worker on the host.
+
+    Slots are leased rather than held, so a crashed worker's slots free up
+    after ``lease_seconds``; live holders renew their lease until they release.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS rate_slots "
+                "(name TEXT NOT NULL, slot_id TEXT PRIMARY KEY, expires REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _transaction(self, fn, *args):
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(connection, *args)
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+            return result
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _take_token(connection: sqlite3.Connection, key: str, capacity: float, rate: float, cost: float) -> float:
+        now = time.time()
+        row = connection.execute(
+            "SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)
+        ).fetchone()
+        tokens = _refill(row[0], row[1], now, capacity, rate) if row else capacity
+        retry_after = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            retry_after = (cost - tokens) / rate
+        connection.execute(
+            "INSERT OR REPLACE INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?)",
+            (key, tokens, now)
+        )
+        return retry_after
+
+    @staticmethod
+    def _acquire_slot(connection: sqlite3.Connection, name: str, limit: int, lease_seconds: float) -> Optional[str]:
+        now = time.time()
+        connection.execute("DELETE FROM rate_slots WHERE name = ? AND expires < ?", (name, now))
+        (taken,) = connection.execute(
+            "SELECT COUNT(*) FROM rate_slots WHERE name = ?", (name,)
+        ).fetchone()
+        if taken >= limit:
+            return None
+        slot_id = uuid.uuid4().hex
+        connection.execute(
+            "INSERT INTO rate_slots (name, slot_id, expires) VALUES (?, ?, ?)",
+            (name, slot_id, now + lease_seconds)
+        )
+        return slot_id
+
+    @staticmethod
+    def _renew_slot(connection: sqlite3.Connection, name: str, slot_id: str, lease_seconds: float):
+        expires = time.time() + lease_seconds
+        updated = connection.execute(
+            "UPDATE rate_slots SET expires = ? WHERE name = ? AND slot_id = ?", (expires, name, slot_id)
+        ).rowcount
+        if not updated:
+            # Expired and swept while still in use (e.g. the renewal was late): count it again
+            connection.execute(
+                "INSERT INTO rate_slots (name, slot_id, expires) VALUES (?, ?, ?)", (name, slot_id, expires)
+            )
+
+    @staticmethod
+    def _release_slot(connection: sqlite3.Connection, name: str, slot_id: str):
+        connection.execute("DELETE FROM rate_slots WHERE name = ? AND slot_id = ?", (name, slot_id))
+
+    async def take_token(self, key: str, capacity: float, rate: float, cost: float = 1.0) -> float:
+        return await asyncio.to_thread(self._transaction, self._take_token, key, capacity, rate, cost)
+
+    async def acquire_slot(self, name: str, limit: int, lease_seconds: float) -> Optional[str]:
+        return await asyncio.to_thread(self._transaction, self._acquire_slot, name, limit, lease_seconds)
+
+    async def renew_slot(self, name: str, slot_id: str, lease_seconds: float):
+        await asyncio.to_thread(self._transaction, self._renew_slot, name, slot_id, lease_seconds)
+
+    async def release_slot(self, name: str, slot_id: str):
+        await asyncio.to_thread(self._transaction, self._release_slot, name, slot_id)
+
+class GenerationAdmission:
+    """Admission control for image generation.
+
+    Each user gets a token bucket of GENERATION_RATE_BURST requests refilled
+    at GENERATION_RATE_PER_MINUTE, and at most GENERATION_MAX_CONCURRENCY
+    pipelines run at once. Set RATE_LIMIT_STORE=sqlite to share both limits
+    between the workers on one host.
+    """
+
+    SLOT_NAME = "generation"
+
+    def __init__(self, store: Optional[RateLimitStore] = None):
+        self.rate_per_minute = float(os.getenv("GENERATION_RATE_PER_MINUTE", "6"))
+        self.burst = float(os.getenv("GENERATION_RATE_BURST", "3"))
+        self.max_concurrency = int(os.getenv("GENERATION_MAX_CONCURRENCY", "8"))
+        self.slot_lease_seconds = float(os.getenv("GENERATION_SLOT_LEASE_SECONDS", "300"))
+        self.busy_retry_after = float(os.getenv("GENERATION_BUSY_RETRY_AFTER", "5"))
+        self._store = store
+        self.rate_limited = 0
+        self.rejected_busy = 0
+        self.in_flight = 0
+
+    @property
+    def store(self) -> RateLimitStore:
+        if self._store is None:
+            backend = os.getenv("RATE_LIMIT_STORE", "memory").lower()
+            if backend == "sqlite":
+                self._store = SQLiteRateLimitStore(os.getenv("RATE_LIMIT_SQLITE_PATH", "./ratelimit.db"))
+            elif backend == "memory":
+                self._store = MemoryRateLimitStore()
+            else:
+                raise ValueError(f"Unknown RATE_LIMIT_STORE: {backend}")
+        return self._store
+
+    @property
+    def max_cost(self) -> Optional[float]:
+        """The most generations one request can be charged for, or None when unlimited."""
+        return max(self.burst, 1) if self.rate_per_minute > 0 else None
+
+    async def check_rate(self, user_id: int, cost: int = 1):
+        """Charge ``cost`` generations to the user's bucket or raise RateLimitExceeded.
+
+        ``cost`` must not exceed ``max_cost``; a larger charge could never be covered.
+        """
+        if self.rate_per_minute <= 0:
+            return
+        retry_after = await self.store.take_token(
+            f"user:{user_id}", max(self.burst, 1), self.rate_per_minute / 60, cost
+        )
+        if retry_after > 0:
+            self.rate_limited += 1
+            raise RateLimitExceeded(retry_after)
+
+    @asynccontextmanager
+    async def slot(self, wait: bool = False):
+        """Hold one generation slot; raises CapacityExceeded unless ``wait`` is set."""
+        while True:
+            slot_id = await self.store.acquire_slot(
+                self.SLOT_NAME, self.max_concurrency, self.slot_lease_seconds
+            )
+            if slot_id is not None:
+                break
+            if not wait:
+                self.rejected_busy += 1
+                raise CapacityExceeded(self.busy_retry_after)
+            await asyncio.sleep(0.5)
+
+        self.in_flight += 1
+        renewal = asyncio.create_task(self._renew(slot_id))
+        try:
+            yield
+        finally:
+            renewal.cancel()
+            self.in_flight -= 1
+            try:
+                await self.store.release_slot(self.SLOT_NAME, slot_id)
+            except Exception as e:
+                print(f"Warning: could not release generation slot: {e}")
+
+    async def _renew(self, slot_id: str):
+        """Keep a held slot's lease alive, however long the pipeline runs."""
+        while True:
+            await asyncio.sleep(self.slot_lease_seconds / 3)
+            try:
+                await self.store.renew_slot(self.SLOT_NAME, slot_id, self.slot_lease_seconds)
+            except Exception as e:
+                print(f"Warning: could not renew generation slot: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_minute": self.rate_per_minute,
+            "burst": self.burst,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "rate_limited": self.rate_limited,
+            "rejected_busy": self.rejected_busy,
+        }
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+generation_admission = GenerationAdmission()
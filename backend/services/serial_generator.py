@@ -1,10 +1,137 @@
-import uuid
-from datetime import datetime
+import os
+import time
+import random
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Snowflake layout: 42 bits of milliseconds since SERIAL_EPOCH, 10 bits of
+# worker id, 12 bits of per-millisecond sequence
+SERIAL_EPOCH = datetime(2024, 1, 1)
+SERIAL_EPOCH_TIMESTAMP = (SERIAL_EPOCH - datetime(1970, 1, 1)).total_seconds()
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+# Crockford base32 is in ASCII order, so fixed-width encodings sort by time
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+ID_LENGTH = 13  # ceil(64 / 5)
+_DECODE = {char: value for value, char in enumerate(ALPHABET)}
+
+# Each process leases a free worker id from this range with a lock file in
+# SERIAL_WORKER_LOCK_DIR. Give every host a disjoint range, e.g. "0-63", "64-127".
+SERIAL_WORKER_IDS = os.getenv("SERIAL_WORKER_IDS", f"0-{MAX_WORKER_ID}")
+SERIAL_WORKER_LOCK_DIR = os.getenv("SERIAL_WORKER_LOCK_DIR", "/tmp/imrich-serial-workers")
+
+def _encode(value: int) -> str:
+    chars = []
+    for _ in range(ID_LENGTH):
+        chars.append(ALPHABET[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+def _decode(text: str) -> Optional[int]:
+    value = 0
+    for char in text:
+        digit = _DECODE.get(char)
+        if digit is None:
+            return None
+        value = (value << 5) | digit
+    return value
+
+class SnowflakeAllocator:
+    """Monotonic 64-bit ids, unique per worker id.
+
+    Within one millisecond up to 4096 ids are issued; past that, or when the
+    clock steps backwards, the allocator keeps counting on from the last
+    millisecond it used instead of waiting or repeating.
+    """
+
+    def __init__(self, worker_ids: str = SERIAL_WORKER_IDS):
+        first, _, last = worker_ids.partition("-")
+        self.worker_range = range(int(first), int(last or first) + 1)
+        if not self.worker_range or self.worker_range[0] < 0 or self.worker_range[-1] > MAX_WORKER_ID:
+            raise ValueError(f"SERIAL_WORKER_IDS must be a range within 0-{MAX_WORKER_ID}")
+        self._worker_id: Optional[int] = None
+        self._owner_pid: Optional[int] = None
+        self._lease = None
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    @property
+    def worker_id(self) -> int:
+        # Leased lazily, and again after a fork: a child must not share its parent's id
+        if self._worker_id is None or self._owner_pid != os.getpid():
+            self._worker_id = self._lease_worker_id()
+            self._owner_pid = os.getpid()
+        return self._worker_id
+
+    def _lease_worker_id(self) -> int:
+        if fcntl is not None:
+            os.makedirs(SERIAL_WORKER_LOCK_DIR, exist_ok=True)
+            for worker_id in self.worker_range:
+                handle = open(os.path.join(SERIAL_WORKER_LOCK_DIR, f"worker-{worker_id}.lock"), "w")
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    handle.close()
+                    continue
+                # Held (and the id reserved) until this process exits
+                self._lease = handle
+                return worker_id
+            raise RuntimeError(f"All serial worker ids in {SERIAL_WORKER_IDS} are leased")
+
+        worker_id = random.choice(self.worker_range)
+        print(f"Warning: serial worker ids can't be leased on this platform, using random id {worker_id}")
+        return worker_id
+
+    def next_id(self) -> int:
+        with self._lock:
+            worker_id = self.worker_id
+            now = int((time.time() - SERIAL_EPOCH_TIMESTAMP) * 1000)
+            if now > self._last_ms:
+                self._last_ms = now
+                self._sequence = 0
+            else:
+                self._sequence += 1
+                if self._sequence > MAX_SEQUENCE:
+                    self._last_ms += 1
+                    self._sequence = 0
+            return (self._last_ms << (WORKER_BITS + SEQUENCE_BITS)) | (worker_id << SEQUENCE_BITS) | self._sequence
+
+allocator = SnowflakeAllocator()
 
 class SerialGenerator:
     @staticmethod
     def generate() -> str:
-        """Generate a unique serial number for an image."""
-        timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-        unique_id = str(uuid.uuid4())[:8].upper()
-        return f"RICH-{timestamp}-{unique_id}"
+        """Generate a unique, time-ordered serial number for an image (RICH-<13 base32 chars>)."""
+        return f"RICH-{_encode(allocator.next_id())}"
+
+    @staticmethod
+    def parse_timestamp(serial: str) -> Optional[datetime]:
+        """Return the UTC creation time embedded in a serial, or None if it isn't one of ours.
+
+        Accepts both current serials and the legacy RICH-<YYYYmmddHHMMSS>-<hex> format.
+        """
+        parts = serial.split("-")
+        if parts[0] != "RICH":
+            return None
+        if len(parts) == 2 and len(parts[1]) == ID_LENGTH:
+            value = _decode(parts[1])
+            if value is None or value >> 64:
+                return None
+            milliseconds = value >> (WORKER_BITS + SEQUENCE_BITS)
+            return SERIAL_EPOCH + timedelta(milliseconds=milliseconds)
+        if len(parts) != 3:
+            return None
+        try:
+            return datetime.strptime(parts[1], "%Y%m%d%H%M%S")
+        except ValueError:
+            return None
@@ -0,0 +1,70 @@
+import os
+import hmac
+import base64
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from services.serial_generator import SerialGenerator
+
+# Truncated HMAC-SHA256 length: 96 bits, 16 base64url characters
+SIGNATURE_BYTES = 12
+
+def _parse_keys(value: str) -> List[Tuple[str, bytes]]:
+    """Parse "k2:secret,k1:older-secret" into (key id, secret) pairs, newest first."""
+    keys = []
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        key_id, _, secret = entry.partition(":")
+        if not key_id.isalnum() or not secret:
+            raise ValueError(f"Invalid SERIAL_SIGNING_KEYS entry for key id {key_id!r}; expected id:secret")
+        keys.append((key_id, secret.encode("utf-8")))
+    return keys
+
+class SerialSigner:
+    """HMAC signatures over a serial and its creation time.
+
+    The QR code of a signed image links to ``/verify/<serial>?sig=<kid>.<mac>``,
+    which lets the API confirm the image is genuine without a database
+    lookup. The first key in SERIAL_SIGNING_KEYS signs new serials; every
+    listed key is accepted, so keys can be rotated by prepending a new one and
+    dropping the old one once its images no longer matter. Signing is off when
+    no keys are configured.
+    """
+
+    def __init__(self, keys: Optional[str] = None):
+        self.keys = _parse_keys(os.getenv("SERIAL_SIGNING_KEYS", "") if keys is None else keys)
+        self._secrets: Dict[str, bytes] = dict(self.keys)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.keys)
+
+    @staticmethod
+    def _mac(secret: bytes, key_id: str, serial: str, issued_at: datetime) -> str:
+        message = f"{key_id}|{serial}|{issued_at.isoformat()}".encode("utf-8")
+        digest = hmac.new(secret, message, hashlib.sha256).digest()[:SIGNATURE_BYTES]
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+    def sign(self, serial: str) -> Optional[str]:
+        """Return the signature for a serial, or None if signing is off."""
+        issued_at = SerialGenerator.parse_timestamp(serial)
+        if not self.enabled or issued_at is None:
+            return None
+        key_id, secret = self.keys[0]
+        return f"{key_id}.{self._mac(secret, key_id, serial, issued_at)}"
+
+    def verify(self, serial: str, signature: str) -> Optional[datetime]:
+        """Return the serial's creation time if ``signature`` is valid for it, else None."""
+        key_id, _, mac = signature.partition(".")
+        secret = self._secrets.get(key_id)
+        issued_at = SerialGenerator.parse_timestamp(serial)
+        if secret is None or issued_at is None:
+            return None
+        if not hmac.compare_digest(mac, self._mac(secret, key_id, serial, issued_at)):
+            return None
+        return issued_at
+
+serial_signer = SerialSigner()
@@ -0,0 +1,254 @@
+import os
+import re
+import asyncio
+import hashlib
+import tempfile
+from datetime import datetime, timezone
+from typing import Optional
+
+# Keys are relative, slash-separated names such as "RICH-..._verified.jpg"
+_KEY_PATTERN = re.compile(r"^[A-Za-z0-9_\-][A-Za-z0-9._\-]*(/[A-Za-z0-9_\-][A-Za-z0-9._\-]*)*$")
+
+class StoredObject:
+    """Metadata about a stored blob."""
+
+    def __init__(
+        self,
+        key: str,
+        size: int,
+        last_modified: datetime,
+        etag: str,
+        path: Optional[str] = None
+    ):
+        self.key = key
+        self.size = size
+        self.last_modified = last_modified
+        self.etag = etag
+        self.path = path  # Local filesystem path, when the backend has one
+
+class StorageBackend:
+    """Interface shared by all image storage backends."""
+
+    @staticmethod
+    def validate_key(key: str) -> str:
+        if not _KEY_PATTERN.match(key) or ".." in key.split("/"):
+            raise ValueError(f"Invalid storage key: {key!r}")
+        return key
+
+    async def save(self, key: str, data: bytes, content_type: str = "image/jpeg", overwrite: bool = True):
+        """Store a blob; with ``overwrite=False`` raise FileExistsError instead of replacing one."""
+        raise NotImplementedError
+
+    async def read(self, key: str) -> bytes:
+        """Return the blob's bytes, raising FileNotFoundError if it does not exist."""
+        raise NotImplementedError
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    async def exists(self, key: str) -> bool:
+        return await self.stat(key) is not None
+
+class LocalShardedStorage(StorageBackend):
+    """Local filesystem storage sharded into hash-prefixed subdirectories.
+
+    ``RICH-..._verified.jpg`` is stored at ``<root>/ab/cd/RICH-..._verified.jpg``
+    where ``abcd`` is the start of the key's SHA-1. Files written before
+    sharding (directly under ``root``) are still found on read.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        digest = hashlib.sha1(self.validate_key(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.root, digest[:2], digest[2:4], key)
+
+    def _existing_path(self, key: str) -> Optional[str]:
+        path = self.path_for(key)
+        if os.path.exists(path):
+            return path
+        legacy_path = os.path.join(self.root, key)
+        if os.path.isfile(legacy_path):
+            return legacy_path
+        return None
+
+    def _write_atomic(self, key: str, data: bytes, overwrite: bool = True):
+        path = self.path_for(key)
+        if not overwrite and os.path.isfile(os.path.join(self.root, key)):
+            raise FileExistsError(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.chmod(tmp_path, 0o644)
+            if overwrite:
+                os.replace(tmp_path, path)
+            else:
+                # link() fails if the name is taken, so a racing writer can't be clobbered
+                os.link(tmp_path, path)
+                os.unlink(tmp_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _read(self, key: str) -> bytes:
+        path = self._existing_path(key)
+        if path is None:
+            raise FileNotFoundError(key)
+        with open(path, "rb") as f:
+            return f.read()
+
+    def _stat(self, key: str) -> Optional[StoredObject]:
+        path = self._existing_path(key)
+        if path is None:
+            return None
+        st = os.stat(path)
+        # Objects are immutable once written, so size + mtime identify the content
+        etag = hashlib.sha1(f"{key}:{st.st_size}:{st.st_mtime_ns}".encode("utf-8")).hexdigest()
+        return StoredObject(
+            key=key,
+            size=st.st_size,
+            last_modified=datetime.fromtimestamp(st.st_mtime, tz=timezone.utc),
+            etag=etag,
+            path=path
+        )
+
+    def _delete(self, key: str):
+        path = self._existing_path(key)
+        if path is not None:
+            os.unlink(path)
+
+    async def save(self, key: str, data: bytes, content_type: str = "image/jpeg", overwrite: bool = True):
+        await asyncio.to_thread(self._write_atomic, key, data, overwrite)
+
+    async def read(self, key: str) -> bytes:
+        return await asyncio.to_thread(self._read, key)
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        self.validate_key(key)
+        return await asyncio.to_thread(self._stat, key)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._delete, key)
+
+class S3Storage(StorageBackend):
+    """S3-compatible object storage (AWS S3, MinIO, R2, ...).
+
+    Requires ``boto3``. Point ``S3_ENDPOINT_URL`` at a local MinIO instance
+    for development and testing.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None
+    ):
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError:
+            raise ImportError("S3 storage requires boto3. Install it with: pip install boto3")
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            config=Config(max_pool_connections=int(os.getenv("S3_MAX_CONNECTIONS", "20"))),
+        )
+
+    def _object_key(self, key: str) -> str:
+        key = self.validate_key(key)
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    @staticmethod
+    def _is_not_found(error: Exception) -> bool:
+        response = getattr(error, "response", None) or {}
+        return response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    def _read(self, key: str) -> bytes:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))
+        except Exception as e:
+            if self._is_not_found(e):
+                raise FileNotFoundError(key)
+            raise
+        return response["Body"].read()
+
+    def _stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except Exception as e:
+            if self._is_not_found(e):
+                return None
+            raise
+        return StoredObject(
+            key=key,
+            size=response["ContentLength"],
+            last_modified=response["LastModified"],
+            etag=response["ETag"].strip('"')
+        )
+
+    def _save(self, key: str, data: bytes, content_type: str, overwrite: bool):
+        extra = {} if overwrite else {"IfNoneMatch": "*"}
+        try:
+            self.client.put_object(
+                Bucket=self.bucket,
+                Key=self._object_key(key),
+                Body=data,
+                ContentType=content_type,
+                **extra
+            )
+        except Exception as e:
+            response = getattr(e, "response", None) or {}
+            if response.get("Error", {}).get("Code") in ("PreconditionFailed", "ConditionalRequestConflict"):
+                raise FileExistsError(key)
+            raise
+
+    async def save(self, key: str, data: bytes, content_type: str = "image/jpeg", overwrite: bool = True):
+        await asyncio.to_thread(self._save, key, data, content_type, overwrite)
+
+    async def read(self, key: str) -> bytes:
+        return await asyncio.to_thread(self._read, key)
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        return await asyncio.to_thread(self._stat, key)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(
+            self.client.delete_object, Bucket=self.bucket, Key=self._object_key(key)
+        )
+
+_storage: Optional[StorageBackend] = None
+
+def get_storage() -> StorageBackend:
+    """Return the configured process-wide storage backend."""
+    global _storage
+    if _storage is None:
+        backend = os.getenv("STORAGE_BACKEND", "local")
+        if backend == "local":
+            _storage = LocalShardedStorage(os.getenv("STORAGE_LOCAL_ROOT", "/app/generated"))
+        elif backend == "s3":
+            bucket = os.getenv("S3_BUCKET")
+            if not bucket:
+                raise ValueError("S3 storage not configured. Please add S3_BUCKET to .env file")
+            _storage = S3Storage(
+                bucket=bucket,
+                prefix=os.getenv("S3_PREFIX", ""),
+                endpoint_url=os.getenv("S3_ENDPOINT_URL") or None,
+                region=os.getenv("S3_REGION") or None
+            )
+        else:
+            raise ValueError(f"Unsupported storage backend: {backend}. Available backends: local, s3")
+    return _storage
@@ -0,0 +1,207 @@
+import os
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import ReadSessionLocal
+from models import Image, User
+from services.bloom_filter import BloomFilter
+from services.serial_generator import SerialGenerator
+from services.serial_signing import serial_signer
+from services.ttl_cache import TTLCache
+
+class VerificationService:
+    """Serial verification with a result cache and a Bloom filter for unknown serials.
+
+    The filter is rebuilt from the serial index at startup and periodically,
+    and updated in-process on every insert. Serials issued by other workers
+    since the last rebuild are not in this worker's filter, so serials
+    younger than the grace window always go to the database. Serials dated
+    in the future can't have been issued and are rejected outright, and
+    database misses are remembered briefly so repeated probes stay cheap.
+    """
+
+    def __init__(self):
+        self.cache = TTLCache(
+            maxsize=int(os.getenv("VERIFY_CACHE_SIZE", "10000")),
+            ttl=float(os.getenv("VERIFY_CACHE_TTL_SECONDS", "3600"))
+        )
+        self.bloom_enabled = os.getenv("VERIFY_BLOOM_ENABLED", "true").lower() == "true"
+        self.bloom_capacity = int(os.getenv("VERIFY_BLOOM_CAPACITY", "1000000"))
+        self.bloom_error_rate = float(os.getenv("VERIFY_BLOOM_ERROR_RATE", "0.001"))
+        self.bloom_grace = timedelta(seconds=float(os.getenv("VERIFY_BLOOM_GRACE_SECONDS", "900")))
+        self.bloom_refresh_seconds = float(os.getenv("VERIFY_BLOOM_REFRESH_SECONDS", "600"))
+        # Allowance for clocks running ahead on the hosts that issue serials
+        self.clock_skew = timedelta(seconds=float(os.getenv("VERIFY_CLOCK_SKEW_SECONDS", "60")))
+        self.miss_cache = TTLCache(
+            maxsize=int(os.getenv("VERIFY_MISS_CACHE_SIZE", "10000")),
+            ttl=float(os.getenv("VERIFY_MISS_CACHE_TTL_SECONDS", "10"))
+        )
+        # Serials per IN query; stays under SQLite's legacy 999 bound-parameter limit
+        self.bulk_chunk_size = int(os.getenv("VERIFY_BULK_CHUNK_SIZE", "900"))
+
+        self.bloom: Optional[BloomFilter] = None
+        self.bloom_built_at: Optional[datetime] = None
+        self.bloom_rejections = 0
+        self.future_rejections = 0
+        self.db_lookups = 0
+        self.signature_hits = 0
+        self.signature_failures = 0
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def rebuild_filter(self, db: AsyncSession):
+        """Load every known serial into a fresh Bloom filter."""
+        if not self.bloom_enabled:
+            return
+        built_at = datetime.utcnow()
+        total = await db.scalar(select(func.count(Image.id)))
+        bloom = BloomFilter(max(self.bloom_capacity, total * 2), self.bloom_error_rate)
+        serials = await db.stream_scalars(
+            select(Image.serial).execution_options(yield_per=10000)
+        )
+        async for serial in serials:
+            bloom.add(serial)
+        self.bloom = bloom
+        self.bloom_built_at = built_at
+
+    async def start(self):
+        async with ReadSessionLocal() as db:
+            await self.rebuild_filter(db)
+        if self.bloom_enabled and self.bloom_refresh_seconds > 0:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            await asyncio.gather(self._refresh_task, return_exceptions=True)
+            self._refresh_task = None
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.bloom_refresh_seconds)
+            try:
+                async with ReadSessionLocal() as db:
+                    await self.rebuild_filter(db)
+            except Exception as e:
+                print(f"Warning: verification filter rebuild failed: {e}")
+
+    def record_serial(self, serial: str):
+        """Make a newly inserted serial visible to this worker's filter."""
+        if self.bloom is not None:
+            self.bloom.add(serial)
+        self.miss_cache.invalidate(serial)
+
+    def _definitely_missing(self, serial: str) -> bool:
+        issued_at = SerialGenerator.parse_timestamp(serial)
+        if issued_at is None:
+            # Not a serial format we ever issue
+            return True
+        if issued_at > datetime.utcnow() + self.clock_skew:
+            # Not issued yet; without this, any future-dated probe skips the filter
+            self.future_rejections += 1
+            return True
+        if self.bloom is None or self.bloom_built_at is None:
+            return False
+        if issued_at > self.bloom_built_at - self.bloom_grace:
+            # Possibly issued by another worker after the last rebuild
+            return False
+        return serial not in self.bloom
+
+    def verify_signature(self, serial: str, signature: str) -> Optional[datetime]:
+        """Check a QR signature without touching the database; returns the creation time if valid."""
+        issued_at = serial_signer.verify(serial, signature)
+        if issued_at is None:
+            self.signature_failures += 1
+        else:
+            self.signature_hits += 1
+        return issued_at
+
+    async def verify(self, db: AsyncSession, serial: str) -> Optional[Dict[str, Any]]:
+        """Return the verification record for a serial, or None if it doesn't exist."""
+        cached = self.cache.get(serial)
+        if cached is not None:
+            return cached
+        if self.miss_cache.get(serial) is not None:
+            return None
+
+        if self._definitely_missing(serial):
+            self.bloom_rejections += 1
+            return None
+
+        # One joined query for the image and its owner's email
+        self.db_lookups += 1
+        result = await db.execute(
+            select(Image.serial, Image.created_at, User.email).outerjoin(
+                User, User.id == Image.user_id
+            ).where(Image.serial == serial)
+        )
+        row = result.first()
+        if row is None:
+            self.miss_cache.set(serial, True)
+            return None
+
+        record = {
+            "serial": row.serial,
+            "created_at": row.created_at,
+            "user_email": row.email,
+        }
+        # A verified serial's record never changes
+        self.cache.set(serial, record)
+        return record
+
+    async def verify_many(
+        self,
+        db: AsyncSession,
+        serials: List[str]
+    ) -> AsyncIterator[List[Tuple[str, Optional[Dict[str, Any]]]]]:
+        """Yield (serial, record or None) pairs in input order, one chunk at a time.
+
+        Each chunk is resolved with a single IN query joined to users. The
+        Bloom filter is skipped: per serial it costs more than the indexed IN
+        lookup it would save. The cache is read but not filled, so one large
+        batch can't evict the entries that single-serial lookups depend on.
+        """
+        for start in range(0, len(serials), self.bulk_chunk_size):
+            chunk = serials[start:start + self.bulk_chunk_size]
+            found: Dict[str, Dict[str, Any]] = {}
+            lookup = set()
+            for serial in chunk:
+                cached = self.cache.get(serial)
+                if cached is not None:
+                    found[serial] = cached
+                else:
+                    lookup.add(serial)
+
+            if lookup:
+                self.db_lookups += 1
+                result = await db.execute(
+                    select(Image.serial, Image.created_at, User.email).outerjoin(
+                        User, User.id == Image.user_id
+                    ).where(Image.serial.in_(lookup))
+                )
+                for row in result:
+                    found[row.serial] = {
+                        "serial": row.serial,
+                        "created_at": row.created_at,
+                        "user_email": row.email,
+                    }
+            yield [(serial, found.get(serial)) for serial in chunk]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cache": self.cache.stats(),
+            "bloom_enabled": self.bloom_enabled,
+            "bloom_entries": self.bloom.count if self.bloom is not None else 0,
+            "bloom_built_at": self.bloom_built_at,
+            "bloom_rejections": self.bloom_rejections,
+            "future_rejections": self.future_rejections,
+            "miss_cache": self.miss_cache.stats(),
+            "db_lookups": self.db_lookups,
+            "signing_enabled": serial_signer.enabled,
+            "signature_hits": self.signature_hits,
+            "signature_failures": self.signature_failures,
+        }
+
+verification_service = VerificationService()
@@ -22,12 +22,18 @@ export interface ImageData {
   payment_status: string;
 }
 
+export interface ImagePage {
+  items: ImageData[];
+  next_cursor: string | null;
+}
+
 export interface VerifyResponse {
   valid: boolean;
   serial?: string;
   created_at?: string;
   image_url_verified?: string;
   user_email?: string;
+  signed?: boolean;
 }
 
 export const imagesApi = {
@@ -36,13 +42,17 @@ export const imagesApi = {
     return response.data;
   },
 
-  verify: async (serial: string): Promise<VerifyResponse> => {
-    const response = await api.get<VerifyResponse>(`/api/verify/${serial}`);
+  verify: async (serial: string, sig?: string): Promise<VerifyResponse> => {
+    const response = await api.get<VerifyResponse>(`/api/verify/${serial}`, {
+      params: sig ? { sig } : {},
+    });
     return response.data;
   },
 
-  getMyImages: async (): Promise<ImageData[]> => {
-    const response = await api.get<ImageData[]>('/api/my-images');
+  getMyImages: async (cursor?: string, limit = 24): Promise<ImagePage> => {
+    const response = await api.get<ImagePage>('/api/my-images', {
+      params: { limit, ...(cursor ? { cursor } : {}) },
+    });
     return response.data;
   },
 };
@@ -7,7 +7,9 @@ const Dashboard: React.FC = () => {
   const { user } = useAuth();
   const location = useLocation();
   const [images, setImages] = useState<ImageData[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [isLoading, setIsLoading] = useState(true);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [error, setError] = useState('');
   const [copiedSerial, setCopiedSerial] = useState<string | null>(null);
 
@@ -17,8 +19,9 @@ const Dashboard: React.FC = () => {
 
   const loadImages = async () => {
     try {
-      const data = await imagesApi.getMyImages();
-      setImages(data);
+      const page = await imagesApi.getMyImages();
+      setImages(page.items);
+      setNextCursor(page.next_cursor);
     } catch (err: any) {
       setError('Failed to load images');
     } finally {
@@ -26,6 +29,20 @@ const Dashboard: React.FC = () => {
     }
   };
 
+  const loadMoreImages = async () => {
+    if (!nextCursor) return;
+    setIsLoadingMore(true);
+    try {
+      const page = await imagesApi.getMyImages(nextCursor);
+      setImages((current) => [...current, ...page.items]);
+      setNextCursor(page.next_cursor);
+    } catch (err: any) {
+      setError('Failed to load more images');
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   const copySerial = (serial: string) => {
     navigator.clipboard.writeText(serial);
     setCopiedSerial(serial);
@@ -91,7 +108,7 @@ const Dashboard: React.FC = () => {
                 {/* Image Preview */}
                 <div className="relative aspect-[9/16] bg-gray-200">
                   <img
-                    src={`http://localhost:8001${image.image_url_wallpaper}`}
+                    src={`http://localhost:8001/api/images/${image.serial}/wallpaper?w=512&fmt=webp`}
                     alt={`Rich image ${image.serial}`}
                     className="w-full h-full object-cover"
                     data-testid="image-preview"
@@ -175,6 +192,19 @@ const Dashboard: React.FC = () => {
             ))}
           </div>
         )}
+
+        {nextCursor && (
+          <div className="mt-8 text-center">
+            <button
+              onClick={loadMoreImages}
+              disabled={isLoadingMore}
+              className="bg-gradient-to-r from-yellow-500 to-yellow-600 text-white px-8 py-3 rounded-lg font-semibold hover:from-yellow-600 hover:to-yellow-700 transition disabled:opacity-50"
+              data-testid="load-more-btn"
+            >
+              {isLoadingMore ? 'Loading...' : 'Load More'}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );
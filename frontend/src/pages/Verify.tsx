@@ -1,9 +1,12 @@
 import React, { useState, useEffect } from 'react';
-import { useParams } from 'react-router-dom';
+import { useParams, useSearchParams } from 'react-router-dom';
 import { imagesApi, VerifyResponse } from '../api/images';
 
 const Verify: React.FC = () => {
   const { serial: urlSerial } = useParams<{ serial: string }>();
+  // Signature from a signed QR link; only valid for the serial in the URL
+  const [searchParams] = useSearchParams();
+  const urlSig = searchParams.get('sig') || undefined;
   const [serial, setSerial] = useState(urlSerial || '');
   const [result, setResult] = useState<VerifyResponse | null>(null);
   const [isLoading, setIsLoading] = useState(false);
@@ -11,15 +14,15 @@ const Verify: React.FC = () => {
 
   useEffect(() => {
     if (urlSerial) {
-      verifySerial(urlSerial);
+      verifySerial(urlSerial, urlSig);
     }
-  }, [urlSerial]);
+  }, [urlSerial, urlSig]);
 
-  const verifySerial = async (serialToVerify: string) => {
+  const verifySerial = async (serialToVerify: string, sig?: string) => {
     setIsLoading(true);
     setHasVerified(false);
     try {
-      const data = await imagesApi.verify(serialToVerify);
+      const data = await imagesApi.verify(serialToVerify, sig);
       setResult(data);
       setHasVerified(true);
     } catch (err) {
@@ -55,7 +58,7 @@ const Verify: React.FC = () => {
                 type="text"
                 value={serial}
                 onChange={(e) => setSerial(e.target.value)}
-                placeholder="Enter serial number (e.g., RICH-20241116-XXXXXXXX)"
+                placeholder="Enter serial number (e.g., RICH-0A8F8PB4W0000)"
                 className="flex-1 px-4 py-3 border border-gray-300 rounded-lg focus:ring-2 focus:ring-yellow-500 focus:border-transparent"
                 data-testid="serial-input"
               />
@@ -113,7 +116,7 @@ const Verify: React.FC = () => {
                   {result.image_url_verified && (
                     <div className="mt-6">
                       <img
-                        src={`http://localhost:8001${result.image_url_verified}`}
+                        src={`http://localhost:8001/api/images/${result.serial}/verified?w=768&fmt=webp`}
                         alt="Verified image"
                         className="max-w-md mx-auto rounded-lg shadow-lg"
                         data-testid="verified-image"